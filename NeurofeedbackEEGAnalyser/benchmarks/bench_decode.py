@@ -0,0 +1,90 @@
+"""
+
+Benchmark: decoding ActiView TCP packets
+
+Compares the vectorized pyactivetwo.decode (with the buffers PacketReader reuses)
+with the per-value Python loop that ActiveTwo.read used before, for all channels
+and for the 3 channels EEGAnalyser needs. Run from the NeurofeedbackEEGAnalyser directory:
+
+    python benchmarks/bench_decode.py
+
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pyactivetwo.pyactivetwo import decode, gather_index
+
+
+# (sampling rate, channels, samples per TCP packet) as set up in ActiView
+CONFIGURATIONS = [(256, 40, 2), (2048, 40, 16), (2048, 136, 16)]
+
+# F3, F4, Cz in the EEGAnalyser montage
+SUBSET = [3, 26, 31]
+
+
+def decode_loop(data, nchannels, tcpsamples):
+    """
+    Former ActiveTwo.read decoder: one ord() per byte, unsigned 24-bit values
+    """
+    signal_buffer = np.zeros((nchannels, tcpsamples))
+    for m in range(tcpsamples):
+        for ch in range(nchannels):
+            offset = m * 3 * nchannels + (ch * 3)
+            sample = (ord(data[offset+2]) << 16)
+            sample += (ord(data[offset+1]) << 8)
+            sample += ord(data[offset])
+            signal_buffer[ch, m] = sample
+    return np.transpose(signal_buffer)
+
+
+def random_packet(nchannels, tcpsamples):
+    """
+    One packet of random 24-bit values in ActiView byte order
+    """
+    return np.random.randint(0, 256, size=nchannels * tcpsamples * 3).astype(np.uint8).tostring()
+
+
+def throughput(function, tcpsamples, number):
+    """
+    Decoded samples per second (best of 3 runs)
+    """
+    return tcpsamples * number / min(timeit.repeat(function, number=number, repeat=3))
+
+
+def decoder(data, nchannels, tcpsamples, channels=None):
+    """
+    decode with precomputed buffers, as PacketReader calls it
+    """
+    index = gather_index(tcpsamples, nchannels, channels)
+    words = np.zeros(index.shape, dtype=np.uint8)
+    out = np.empty(index.shape[:2])
+    return lambda: decode(data, nchannels, out=out, index=index, words=words)
+
+
+def main():
+    print '%6s %6s %6s %14s %14s %14s %8s' % ('sfreq', 'chans', 'tcpsmp', 'loop [smp/s]', 'decode [smp/s]',
+                                              'subset [smp/s]', 'speedup')
+    for sfreq, nchannels, tcpsamples in CONFIGURATIONS:
+        data = random_packet(nchannels, tcpsamples)
+
+        # both decoders must agree (the loop does not extend the sign)
+        expected = decode_loop(data, nchannels, tcpsamples)
+        assert np.array_equal(decode(data, nchannels) & 0xFFFFFF, expected)
+        assert np.array_equal(decode(data, nchannels, channels=SUBSET) & 0xFFFFFF, expected[:, SUBSET])
+
+        number = max(1, 20000 // (nchannels * tcpsamples))
+        loop = throughput(lambda: decode_loop(data, nchannels, tcpsamples), tcpsamples, number)
+        vectorized = throughput(decoder(data, nchannels, tcpsamples), tcpsamples, number * 100)
+        subset = throughput(decoder(data, nchannels, tcpsamples, SUBSET), tcpsamples, number * 100)
+
+        print '%6d %6d %6d %14.0f %14.0f %14.0f %7.1fx' % (sfreq, nchannels, tcpsamples,
+                                                          loop, vectorized, subset, vectorized / loop)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+
+Benchmark: alpha band power of one analysis window
+
+Compares the former analizujEEG chain (select_channels, Hanning window applied
+sample by sample, wyrm spectrum, sum of bins) with the precomputed DFT basis
+(bazaPasma / mocPasma). Run from the NeurofeedbackEEGAnalyser directory:
+
+    python benchmarks/bench_moc.py
+
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import scipy as sp
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path[:0] = [SRC, os.path.join(SRC, 'analyser')]
+from wyrm.types import Data
+import wyrm.processing as proc
+from moc import bazaPasma, mocPasma
+
+
+# (sampling rate, window length in s, channels with alpha power computed)
+CONFIGURATIONS = [(256, 1.0, 2), (512, 1.0, 2), (2048, 1.0, 2), (256, 2.0, 32)]
+
+
+def former_chain(data, channels):
+    """
+    Former analizujEEG: per channel select, window, spectrum and sum of 8-12 Hz
+    """
+    window = sp.hanning(len(data.data))
+    power = []
+    for channel in channels:
+        selected = proc.select_channels(data, [channel])
+        selected.data = np.array([a*b for a,b in zip(selected.data, window)])
+        spectrum = proc.spectrum(selected)
+        bins = (spectrum.axes[0] >= 8) & (spectrum.axes[0] < 12)
+        power.append(spectrum.data[bins].sum())
+    return np.array(power)
+
+
+def main():
+    print '%6s %6s %6s %14s %14s %8s' % ('sfreq', 'window', 'chans', 'former [ms]', 'basis [ms]', 'speedup')
+    for sfreq, seconds, nchannels in CONFIGURATIONS:
+        n = int(sfreq * seconds)
+        channels = ['ch%d' % i for i in range(nchannels)]
+        data = Data(np.random.normal(0, 100, (n, nchannels)).astype(np.float32),
+                    [range(n), channels], ['czas', 'kanal'], ['ms', 'nazwa'])
+        data.fs = sfreq
+
+        basis = bazaPasma(sfreq, n, 8, 12, data.data.dtype)
+        assert np.allclose(former_chain(data, channels), mocPasma(data.data, basis), rtol=1e-4)
+
+        number = 20
+        former = min(timeit.repeat(lambda: former_chain(data, channels), number=number, repeat=3)) / number
+        number = 1000
+        kernel = min(timeit.repeat(lambda: mocPasma(data.data, bazaPasma(sfreq, n, 8, 12, data.data.dtype)),
+                                   number=number, repeat=3)) / number
+
+        print '%6d %6.1f %6d %14.3f %14.3f %7.1fx' % (sfreq, seconds, nchannels, former * 1000,
+                                                       kernel * 1000, former / kernel)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+
+Benchmark: per-update overhead of analizujEEG
+
+Compares the former wyrm-based analizujEEG (Data object with a range time axis,
+select_channels, rereference and astype, each copying the window) with the
+analysis plan compiled at startup (PlanAnalizy), which works on ndarray views.
+Both compute the same alpha power on the same int32 window. Run from the
+NeurofeedbackEEGAnalyser directory:
+
+    python benchmarks/bench_plan.py
+
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path[:0] = [SRC, os.path.join(SRC, 'analyser')]
+from wyrm.types import Data
+import wyrm.processing as proc
+from moc import bazaPasma, mocPasma
+from plan import PlanAnalizy
+
+
+CHANNELS = ['F3', 'F4', 'Cz']
+LEFT, RIGHT, REFERENCE = ['F3'], ['F4'], 'Cz'
+# (sampling rate, window length in s)
+CONFIGURATIONS = [(256, 1.0), (512, 1.0), (2048, 1.0), (256, 4.0)]
+
+
+def former_path(window, sfreq):
+    """
+    Former analizujEEG: wrap the window in Data, select, rereference, convert, power
+    """
+    data = Data(window, [range(len(window)), CHANNELS], ['czas', 'kanal'], ['ms', 'nazwa'])
+    data.fs = sfreq
+    data = proc.select_channels(data, CHANNELS)
+    data = proc.rereference(data, REFERENCE)
+    data.data = data.data.astype(np.float32)
+    channels = list(data.axes[-1])
+    columns = [channels.index(k) for k in LEFT + RIGHT]
+    basis = bazaPasma(data.fs, len(data.data), 8, 12, data.data.dtype)
+    return mocPasma(data.data[:, columns], basis)
+
+
+def main():
+    print '%6s %6s %14s %14s %8s' % ('sfreq', 'window', 'former [us]', 'plan [us]', 'speedup')
+    for sfreq, seconds in CONFIGURATIONS:
+        n = int(sfreq * seconds)
+        window = np.random.randint(-2 ** 20, 2 ** 20, (n, len(CHANNELS))).astype(np.int32)
+        plan = PlanAnalizy(sfreq, CHANNELS, LEFT, RIGHT, REFERENCE, (8, 12))
+        assert np.allclose(former_path(window, sfreq), plan.analizuj(window)[:2], rtol=1e-4)
+
+        number = 200
+        former = min(timeit.repeat(lambda: former_path(window, sfreq), number=number, repeat=3)) / number
+        plan_time = min(timeit.repeat(lambda: plan.analizuj(window), number=number, repeat=3)) / number
+
+        print '%6d %6.1f %14.1f %14.1f %7.1fx' % (sfreq, seconds, former * 1e6, plan_time * 1e6,
+                                                   former / plan_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+
+Benchmark suite: acquisition-to-LSL pipeline
+
+Measures every stage of EEGAnalyser on the bundled raw_eeg recording and on larger
+synthetic montages:
+
+    decode          PacketReader receiving and decoding ActiView packets (all channels)
+    window          BuforKolowy update and the copy of the window handed to analysis
+    analizujOkna    the analysis plan analizujOkna runs (alpha of F3/F4 against Cz and
+                    theta/alpha/SMR/beta of up to 32 channels)
+    wyrm.*          select_channels, rereference and spectrum on a one-second window
+
+Every update carries 1/10 s of signal (CZESTOTLIWOSC = 10). The suite reports the latency
+of an update (mean, p50, p99), the throughput as a multiple of real time and the peak
+memory allocated during updates: with tracemalloc where it exists (Python 3), otherwise
+as the growth of the peak resident set size in a forked process (Linux: /proc, other
+Unix: getrusage; not measured on Windows). Results are saved to JSON and can be compared
+with an earlier run. Run from the NeurofeedbackEEGAnalyser directory:
+
+    python benchmarks/bench_suite.py --output new.json --compare old.json
+
+"""
+
+import argparse
+import ctypes
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, '..', 'src')
+sys.path[:0] = [SRC, os.path.join(SRC, 'analyser')]
+from pyactivetwo.pyactivetwo import PacketReader, clock
+from pyactivetwo.simulator import encode, load_raw_eeg, synthetic
+from wyrm.types import Data
+import wyrm.processing as proc
+from bufor import BuforKolowy
+from plan import PlanAnalizy
+
+
+# (source, sampling rate, channels)
+MONTAGES = [('raw_eeg', 256, 40),
+            ('synthetic', 512, 64), ('synthetic', 2048, 64),
+            ('synthetic', 512, 128), ('synthetic', 2048, 128)]
+
+UPDATES_PER_SECOND = 10
+TCPSAMPLES = 16
+BANDS = [('theta', 4, 8), ('alpha', 8, 12), ('smr', 12, 15), ('beta', 15, 30)]
+# F3, F4 and Cz in the EEGAnalyser montage
+LEFT, RIGHT, REFERENCE = 3, 26, 31
+
+
+class FeedSocket():
+    """
+    Socket replacement giving PacketReader the same bytes in a loop
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def recv_into(self, view, nbytes):
+        nbytes = min(nbytes, len(self.data) - self.position)
+        view[:nbytes] = self.data[self.position:self.position + nbytes]
+        self.position = (self.position + nbytes) % len(self.data)
+        return nbytes
+
+
+def rss():
+    """
+    Resident set size and its peak, in bytes
+    """
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+        return int(status['VmRSS'].split()[0]) * 1024, int(status['VmHWM'].split()[0]) * 1024
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return peak, peak
+
+
+def rss_peak(update, calls):
+    """
+    Growth of the peak resident set size while calling update(i), measured in a forked process,
+    so that memory touched by earlier benchmarks does not hide it. The resolution is a page or
+    more (the kernel updates the counters in batches) and outside glibc allocations reusing
+    memory freed earlier are not seen.
+    :return: Bytes (None if it cannot be measured)
+    """
+    if not hasattr(os, 'fork') or (resource is None and not os.path.exists('/proc/self/status')):
+        return None
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read)
+            # caches built by the first call are not counted
+            update(0)
+            try:
+                # glibc: give the pages of freed heap memory (also inherited from the parent)
+                # back to the system, so that reusing them shows in the resident set size
+                ctypes.CDLL(None).malloc_trim(0)
+            except (OSError, AttributeError):
+                pass
+            try:
+                # reset the peak to the current size (Linux)
+                with open('/proc/self/clear_refs', 'w') as f:
+                    f.write('5')
+            except IOError:
+                pass
+            base = rss()[0]
+            for i in range(calls):
+                update(i)
+            os.write(write, str(max(0, rss()[1] - base)))
+        finally:
+            os._exit(0)
+    os.close(write)
+    peak = os.read(read, 64)
+    os.close(read)
+    os.waitpid(pid, 0)
+    return int(peak) if peak else None
+
+
+def measure(update, calls):
+    """
+    Time update(i) for i in range(calls), then run it again to find the memory it allocates
+    :return: Latencies in seconds + peak allocated bytes (None if not measurable, see rss_peak)
+    """
+    latencies = np.empty(calls)
+    for i in range(calls):
+        start = clock()
+        update(i)
+        latencies[i] = clock() - start
+
+    # separate pass, because tracing slows the calls down
+    if tracemalloc is not None:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        for i in range(min(calls, 50)):
+            update(i)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    else:
+        peak = rss_peak(update, min(calls, 50))
+    return latencies, peak
+
+
+def result(name, source, sfreq, nchannels, samples, latencies, peak):
+    """
+    Summary of one benchmark
+    :param samples: Number of samples processed by one update
+    """
+    mean = latencies.mean()
+    return {'benchmark': name, 'source': source, 'sfreq': sfreq, 'channels': nchannels,
+            'calls': len(latencies),
+            'mean_us': mean * 1e6,
+            'p50_us': np.percentile(latencies, 50) * 1e6,
+            'p99_us': np.percentile(latencies, 99) * 1e6,
+            'samples_per_s': samples / mean,
+            'realtime_factor': samples / mean / sfreq,
+            'peak_alloc_bytes': peak}
+
+
+def bench_decode(signal, sfreq, calls):
+    nchannels = signal.shape[1]
+    packets = len(signal) // TCPSAMPLES
+    reader = PacketReader(FeedSocket(encode(signal[:packets * TCPSAMPLES])), nchannels, TCPSAMPLES,
+                          dtype=np.int32)
+    samples = int(np.ceil(sfreq / float(UPDATES_PER_SECOND) / TCPSAMPLES)) * TCPSAMPLES
+    out = np.empty((samples, nchannels), dtype=np.int32)
+    return samples, measure(lambda i: reader.read(out), calls)
+
+
+def bench_window(signal, sfreq, calls):
+    samples = sfreq // UPDATES_PER_SECOND
+    buffer = BuforKolowy(sfreq, signal.shape[1], signal.dtype)
+    copy = np.empty((sfreq, signal.shape[1]), dtype=signal.dtype)
+
+    def update(i):
+        start = (i * samples) % (len(signal) - samples)
+        buffer.dodaj(signal[start:start + samples])
+        window = buffer.okno()
+        copy[:len(window)] = window
+    return samples, measure(update, calls)
+
+
+def bench_analysis(signal, sfreq, calls):
+    nchannels = signal.shape[1]
+    names = ['ch%d' % i for i in range(nchannels)]
+    plan = PlanAnalizy(sfreq, names, [names[LEFT]], [names[RIGHT]], names[REFERENCE], (8, 12),
+                       pasma=BANDS, skalp=names[:32])
+    samples = sfreq // UPDATES_PER_SECOND
+    windows = len(signal) - sfreq
+    return samples, measure(lambda i: plan.analizuj(signal[(i * samples) % windows:][:sfreq]), calls)
+
+
+def bench_wyrm(signal, sfreq, calls):
+    nchannels = signal.shape[1]
+    names = ['ch%d' % i for i in range(nchannels)]
+    data = Data(signal[:sfreq].astype(np.float32), [range(sfreq), names], ['czas', 'kanal'], ['ms', 'nazwa'])
+    data.fs = sfreq
+    selected = [names[LEFT], names[RIGHT], names[REFERENCE]]
+    samples = sfreq // UPDATES_PER_SECOND
+    return [('wyrm.select_channels', samples, measure(lambda i: proc.select_channels(data, selected), calls)),
+            ('wyrm.rereference', samples, measure(lambda i: proc.rereference(data, names[REFERENCE]), calls)),
+            ('wyrm.spectrum', samples, measure(lambda i: proc.spectrum(data), calls))]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, filename):
+    """
+    Print the change of mean latency against an earlier run
+    """
+    with open(filename) as f:
+        old = dict(((r['benchmark'], r['source'], r['sfreq'], r['channels']), r) for r in json.load(f)['results'])
+    print
+    print 'Compared with %s (mean latency, new / old):' % filename
+    for r in results:
+        key = (r['benchmark'], r['source'], r['sfreq'], r['channels'])
+        if key in old:
+            print '%-22s %-10s %5d Hz %4d ch %8.2fx' % (key + (r['mean_us'] / old[key]['mean_us'],))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the EEGAnalyser pipeline')
+    parser.add_argument('--seconds', type=float, default=20,
+                        help='seconds of signal processed by every benchmark')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file to save the results to')
+    parser.add_argument('--compare', metavar='JSON', help='results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    calls = int(args.seconds * UPDATES_PER_SECOND)
+    results = []
+    print '%-22s %-10s %8s %5s %10s %10s %10s %10s %12s' % (
+        'benchmark', 'source', 'sfreq', 'chans', 'mean [us]', 'p50 [us]', 'p99 [us]', 'x realtime', 'peak alloc')
+    for source, sfreq, nchannels in MONTAGES:
+        if source == 'raw_eeg':
+            signal = load_raw_eeg(os.path.join(HERE, '..', 'raw_eeg'))
+        else:
+            signal = synthetic(sfreq, nchannels, seconds=10)
+        runs = [('decode',) + bench_decode(signal, sfreq, calls),
+                ('window',) + bench_window(signal, sfreq, calls),
+                ('analizujOkna',) + bench_analysis(signal, sfreq, calls)]
+        runs += bench_wyrm(signal, sfreq, calls)
+        for name, samples, (latencies, peak) in runs:
+            r = result(name, source, sfreq, nchannels, samples, latencies, peak)
+            results.append(r)
+            print '%-22s %-10s %8d %5d %10.1f %10.1f %10.1f %10.0f %12s' % (
+                name, source, sfreq, nchannels, r['mean_us'], r['p50_us'], r['p99_us'], r['realtime_factor'],
+                '-' if peak is None else peak)
+
+    with open(args.output, 'w') as f:
+        json.dump({'revision': git_revision(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'python': platform.python_version(), 'numpy': np.__version__,
+                   'platform': platform.platform(), 'updates_per_second': UPDATES_PER_SECOND,
+                   'results': results}, f, indent=1, sort_keys=True)
+    print 'Saved to %s' % args.output
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
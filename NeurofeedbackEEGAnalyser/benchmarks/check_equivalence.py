@@ -0,0 +1,216 @@
+"""
+
+Equivalence checks of the streaming stages against their reference computations
+
+    sdft        EEGAnalyser.odtworz of raw_eeg with METODA = 'sdft' against METODA = 'fft' (the
+                analysis plan), for every window type the sliding DFT supports
+    decimation  Decymacja fed in random blocks against lfilter with the same FIR followed by [::q]
+    packets     PacketReader.read and read_available fed by a socket delivering the encoded signal
+                in random pieces (1 to 3000 bytes), for receive buffers of 1, 2 and 64 packets
+    replay      EEGAnalyser.odtworz of the raw_eeg fixtures, of the same signal as .npy and as BDF
+                writes identical result files
+
+Run from the NeurofeedbackEEGAnalyser directory (exits with 1 if any check fails):
+
+    python benchmarks/check_equivalence.py
+
+"""
+
+import filecmp
+import os
+import shutil
+import socket
+import sys
+import tempfile
+
+import numpy as np
+from scipy import signal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, '..', 'src')
+sys.path[:0] = [SRC, os.path.join(SRC, 'analyser')]
+from pyactivetwo.pyactivetwo import PacketReader
+from pyactivetwo.simulator import encode, load_raw_eeg, synthetic
+from decymacja import Decymacja
+from analyser.analyser import EEGAnalyser
+
+RAW_EEG = os.path.join(HERE, '..', 'raw_eeg')
+
+
+def blocks(signal, seed=0, largest=40):
+    """
+    Split the signal into consecutive blocks of random length (1 to largest samples)
+    """
+    random = np.random.RandomState(seed)
+    start = 0
+    while start < len(signal):
+        end = start + random.randint(1, largest + 1)
+        yield signal[start:end]
+        start = end
+
+
+def replay(recording, results, sfreq=256, **settings):
+    """
+    Replay the recording with EEGAnalyser.odtworz, with the default settings changed by settings
+    (standard.cfg is not read)
+    """
+    analyser = EEGAnalyser()
+    analyser.plikUstawien = os.devnull
+    for name, value in settings.items():
+        setattr(analyser, name, value)
+    analyser.odtworz(recording, results, sfreq)
+
+
+def check_sdft():
+    """
+    Largest relative difference between the alpha levels of the sliding DFT and of the FFT analysis
+    (the sliding DFT sends nothing until its first window is full, so only the last rows are compared)
+    """
+    worst = 0.0
+    directory = tempfile.mkdtemp()
+    try:
+        for window in ['hann', 'hamming', 'blackman']:
+            levels = {}
+            for method in ['fft', 'sdft']:
+                results = os.path.join(directory, '%s_%s.txt' % (method, window))
+                replay(RAW_EEG, results, METODA=method, OKNO=window)
+                # alpha levels without the window numbers (the sliding DFT numbers only what it sends)
+                levels[method] = np.loadtxt(results)[:, :2]
+            if not 0 < len(levels['sdft']) <= len(levels['fft']):
+                return np.inf
+            expected = levels['fft'][-len(levels['sdft']):]
+            worst = max(worst, np.max(np.abs(levels['sdft'] - expected) / np.abs(expected)))
+    finally:
+        shutil.rmtree(directory)
+    return worst
+
+
+def check_decimation():
+    """
+    Largest difference (relative to the signal range) between Decymacja and lfilter + [::q]
+    """
+    worst = 0.0
+    for sfreq, q in [(256, 2), (2048, 8), (2048, 16)]:
+        data = synthetic(sfreq, 4, seconds=5)
+        h = signal.firwin(20 * q + 1, 1.0 / q, window=('kaiser', 5.0))
+        # Decymacja assumes the signal was constant before its first sample
+        padded = np.concatenate([np.repeat(data[:1], len(h) - 1, axis=0), data])
+        expected = signal.lfilter(h, [1.0], padded, axis=0)[len(h) - 1:][::q]
+        decimation = Decymacja(q, np.float64)
+        decimated = np.concatenate([decimation.dodaj(block) for block in blocks(data, largest=5 * q)])
+        if decimated.shape != expected.shape:
+            return np.inf
+        worst = max(worst, np.max(np.abs(decimated - expected)) / np.ptp(data))
+    return worst
+
+
+class PieceSocket():
+    """
+    Socket delivering data in pieces of random length, as TCP may split and merge ActiView packets
+    """
+
+    def __init__(self, data, seed=0, largest=3000):
+        self.data = data
+        self.position = 0
+        self.random = np.random.RandomState(seed)
+        self.largest = largest
+
+    def recv_into(self, buffer, nbytes):
+        nbytes = min(nbytes, self.random.randint(1, self.largest + 1), len(self.data) - self.position)
+        buffer[:nbytes] = self.data[self.position:self.position + nbytes]
+        self.position += nbytes
+        return nbytes
+
+
+def check_packets():
+    """
+    Whether PacketReader returns exactly the encoded signal however the socket splits it
+    """
+    nchannels, tcpsamples = 40, 2
+    random = np.random.RandomState(0)
+    data = random.randint(-2 ** 23, 2 ** 23, size=(20000, nchannels)).astype(np.int32)
+    channels = [3, 26, 31]
+    for packets in [1, 2, 64]:
+        # read: blocks of a few packets, a subset of the channels
+        reader = PacketReader(PieceSocket(encode(data)), nchannels, tcpsamples, channels, np.int32,
+                              packets=packets)
+        read = []
+        while sum(len(r) for r in read) < len(data) - 50 * tcpsamples:
+            out = np.empty((tcpsamples * random.randint(1, 51), len(channels)), dtype=np.int32)
+            read.append(reader.read(out))
+        read = np.concatenate(read)
+        if not np.array_equal(read, data[:len(read), channels]):
+            return False
+
+        # read_available: whatever has arrived, all channels, until the connection closes
+        reader = PacketReader(PieceSocket(encode(data)), nchannels, tcpsamples, dtype=np.int32,
+                              packets=packets)
+        read = []
+        try:
+            while True:
+                read.append(reader.read_available())
+        except socket.error:
+            pass
+        if not np.array_equal(np.concatenate(read), data):
+            return False
+    return True
+
+
+def write_bdf(filename, data, sfreq):
+    """
+    Write the signal (samples x channels, BioSemi units) as a BDF file with one-second records
+    """
+    nrecords = len(data) // sfreq
+    nchannels = data.shape[1]
+    header = ('\xffBIOSEMI'.ljust(8) + ' ' * 160 + '01.01.16' + '00.00.00' + str(256 * (nchannels + 1)).ljust(8)
+              + '24BIT'.ljust(44) + str(nrecords).ljust(8) + '1'.ljust(8) + str(nchannels).ljust(4))
+    channels = [('A%d' % (i + 1)).ljust(16) for i in range(nchannels)] + [' ' * 80 * nchannels]
+    channels += [' ' * 8 * nchannels * 5, ' ' * 80 * nchannels, str(sfreq).ljust(8) * nchannels]
+    channels += [' ' * 32 * nchannels]
+    # every record holds one second of the first channel, then of the second one and so on
+    records = data[:nrecords * sfreq].reshape(nrecords, sfreq, nchannels).transpose(0, 2, 1)
+    with open(filename, 'wb') as f:
+        f.write(header + ''.join(channels))
+        f.write(encode(records.reshape(-1, sfreq)))
+
+
+def check_replay():
+    """
+    Whether replaying raw_eeg, the same signal as .npy and as BDF writes identical result files
+    """
+    sfreq = 256
+    data = load_raw_eeg(RAW_EEG)
+    directory = tempfile.mkdtemp()
+    try:
+        np.save(os.path.join(directory, 'eeg.npy'), data)
+        write_bdf(os.path.join(directory, 'eeg.bdf'), data, sfreq)
+        results = []
+        for recording in [RAW_EEG, os.path.join(directory, 'eeg.npy'), os.path.join(directory, 'eeg.bdf')]:
+            name = os.path.join(directory, 'results_%d.txt' % len(results))
+            replay(recording, name, sfreq)
+            results.append(sorted(f for f in os.listdir(directory) if f.startswith('results_%d' % len(results))))
+        return all(len(files) == len(results[0]) and
+                   all(filecmp.cmp(os.path.join(directory, a), os.path.join(directory, b), shallow=False)
+                       for a, b in zip(results[0], files))
+                   for files in results[1:])
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    sdft = check_sdft()
+    decimation = check_decimation()
+    packets = check_packets()
+    identical = check_replay()
+    checks = [('sdft', 'max relative difference from fft %.2e' % sdft, sdft < 1e-4),
+              ('decimation', 'max difference / signal range %.2e' % decimation, decimation < 1e-9),
+              ('packets', 'decoded signal %s' % ('identical' if packets else 'differs'), packets),
+              ('replay', 'raw_eeg, .npy and BDF results %s' % ('identical' if identical else 'differ'), identical)]
+    print
+    for name, result, passed in checks:
+        print '%-12s %-48s %s' % (name, result, 'ok' if passed else 'FAILED')
+    sys.exit(0 if all(passed for _, _, passed in checks) else 1)
+
+
+if __name__ == '__main__':
+    main()
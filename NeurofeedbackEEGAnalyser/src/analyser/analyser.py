@@ -15,16 +15,18 @@ W ActiView w zakładce TCP Server musi być ustawione TCP Subset na A1-A32 + Add
 """
 
 import numpy as np
-import threading
-import os, traceback
+import threading, Queue
+import os, sys, time, traceback
 
-from pylsl import StreamInfo, StreamOutlet
-from pyactivetwo.pyactivetwo import ActiveTwo
-
-import scipy as sp
-
-from wyrm.types import Data
-import wyrm.processing as proc
+from pyactivetwo.pyactivetwo import ActiveTwo, ActiveTwoProcess, clock
+from pyactivetwo.replay import Replay, load_recording
+from bufor import BuforKolowy
+from decymacja import Decymacja
+from moc import ObwiedniaIIR, PrzesuwnaDFT
+from opoznienia import Opoznienia
+from plan import PlanAnalizy
+from zapis import ZapisWynikow
+from zegar import ZegarProbek
 
 
 class EEGAnalyser():
@@ -35,14 +37,89 @@ class EEGAnalyser():
         # w pliku ustawień jest możliwość nadpisania okna czasowego i czestotliwosci
         self.plikUstawien = 'NeurofeedbackEEGAnalyser\standard.cfg'
         
+        # zegar znaczników czasu wyników: local_clock LabStreamLayer na
+        # żywo (ustawiany w start), zegar pyactivetwo przy odtwarzaniu
+        self.zegar_wynikow = clock
+        
         self.OKNO_CZASOWE = 1.0  # długość okna (w s), z którego liczona jest moc alfy
         self.CZESTOTLIWOSC = 10  # (w Hz) jak często liczona jest moc alfy 
         
+        # metoda liczenia mocy alfy: 'fft' (transformata całego okna przy
+        # każdej aktualizacji), 'sdft' (przesuwna DFT aktualizowana
+        # nowymi próbkami - koszt nie zależy od długości okna, więc
+        # CZESTOTLIWOSC może być dużo większa; te same wyniki co 'fft', ale
+        # dopiero od zapełnienia okna) albo 'iir' (filtr
+        # pasmowoprzepustowy, kwadrat i wygładzanie - bez opóźnienia pół
+        # okna; wynik to moc, a nie suma amplitud)
+        self.METODA = 'fft'
+        # stała czasowa (w s) wygładzania mocy dla METODA = 'iir'
+        self.STALA_CZASOWA = 0.25
+        # pasmo (w Hz), którego moc jest liczona: od <= f < do
+        self.PASMO = (8, 12)
+        # okno nakładane przed transformatą: 'hann', 'hamming', 'blackman'
+        # albo 'dpss' (okno Slepiana; tylko METODA = 'fft')
+        self.OKNO = 'hann'
+        # częstotliwość próbkowania (w Hz), do której sygnał jest decymowany
+        # przed analizą (co najmniej tyle; 0 - bez decymacji)
+        self.CZESTOTLIWOSC_ANALIZY = 0
+        
+        # długości (w s) dodatkowych okien, dla których moc alfy liczona jest
+        # z tego samego bufora, np. [0.25, 2.0] - szybka i stabilna ocena;
+        # wysyłane strumieniem 'BCIAlphaLevels' (tylko METODA = 'fft')
+        self.DODATKOWE_OKNA = []
+        
+        # pasma (nazwa, od, do w Hz), których moc dla wszystkich kanałów
+        # skalpu wysyłana jest osobnym strumieniem 'BCIBandPower' (pasma x
+        # kanały, tylko METODA = 'fft'); pusta lista wyłącza ten strumień
+        self.PASMA = [('theta', 4, 8), ('alpha', 8, 12), ('smr', 12, 15), ('beta', 15, 30)]
+        
+        # typ próbek EEG we wszystkich buforach: 'int32' (surowe wartości
+        # z BioSemi) albo 'float32' z MIKROWOLTY = True (mikrowolty)
+        self.TYP_PROBEK = 'int32'
+        self.MIKROWOLTY = False
+        
+        # liczba wątków analizy i liczba okien czekających na analizę; gdy
+        # kolejka jest pełna, najstarsze okno jest porzucane
+        self.WATKI_ANALIZY = 1
+        self.KOLEJKA_ANALIZY = 2
+        
+        # co ile sekund wypisywane są percentyle opóźnień kolejnych etapów
+        # (0 - nie wypisujemy; pomiary są zbierane zawsze)
+        self.RAPORT_OPOZNIEN = 10
+        
+        # odczyt i dekodowanie pakietów w osobnym procesie (próbki przez
+        # pamięć współdzieloną), żeby analiza nie konkurowała z nim o GIL;
+        # stan akwizycji wypisywany jest razem z percentylami opóźnień
+        self.OSOBNY_PROCES = False
+        
+        # parametry strumieni wyjściowych LabStreamLayer: chunk_size (ile
+        # wyników w paczce, 0 - każde wysłanie to paczka) i max_buffered
+        # (ile sekund wyników trzyma strumień, gdy odbiorca nie nadąża)
+        self.PACZKA_LSL = 0
+        self.BUFOR_LSL = 360
+        
+        # opóźnienia etapów (w s, zegar monotoniczny z pyactivetwo):
+        # decode - od odebrania pakietu do zapisania próbek przez ActiveTwo,
+        # bufor - od zapisania najnowszej próbki do pobrania jej do okna,
+        # kolejka - czekanie okna na wątek analizy, analiza - obliczenia,
+        # wysylanie - push_sample, calkowite - od zapisania najnowszej
+        # próbki okna do wysłania wyniku
+        self.opoznienia = Opoznienia()
+        
+        self.numer_okna = 0         # numer kolejny ostatniego okna
+        self.porzucone_okna = 0     # okna usunięte z kolejki bez analizy
+        self.porzucone_wyniki = 0   # wyniki starsze od już wysłanych
+        self.ostatni_wynik = 0      # numer okna ostatnio wysłanego wyniku
+        self.blokada_wyniku = threading.Lock()
+        self.wypisuj_wyniki = True  # czy wypisywać każdy wynik na konsolę
+        
         self.kanaly_wszystkie = ['Fp1', 'AF3', 'F7', 'F3', 'FC1', 'FC5', 'T7', 'C3',
                                  'CP1', 'CP5', 'P7', 'P3', 'Pz', 'PO3', 'O1', 'Oz',
                                  'O2', 'PO4', 'P4', 'P8', 'CP6', 'CP2', 'C4', 'T8',
                                  'FC6', 'FC2', 'F4', 'F8', 'AF4', 'Fp2', 'Fz', 'Cz',
                                  'EX1', 'EX2', 'EX3', 'EX4', 'EX5', 'EX6', 'EX7', 'EX8']
+        # kanały skalpu (A1-A32), dla których liczona jest moc pasm PASMA
+        self.kanaly_skalpu = self.kanaly_wszystkie[:32]
         
         # kanały, które analizujemy (F3 i F4 za Davidsonem + Cz jako referencja)
         self.kanaly_do_analizy = ['F3', 'F4', 'Cz']
@@ -60,22 +137,97 @@ class EEGAnalyser():
             ---------------------- INICJALIZACJA ----------------------
             -----------------------------------------------------------'''
         
-        # strumień wyjściowy LabStreamLayer do wysyłania poziomów alfy
-        info = StreamInfo('BCIAlphaLevel', 'Markers', 2, 0, 'float32',
-                          'neurolab-laptop-1')
-        self.strumien = StreamOutlet(info)
-        
         host = '127.0.0.1'  # host na ktorym jest wlaczone ActiView
         port = 8888         # port na ktorym nasluchuje ActiView
         freq = 256          # czestotliwosc probkowania (ustalane w ActiView)
         channels = 40       # liczba kanalow wysylanych przez TCP (wyswietlane w AV)
         tcpsamples = 2      # liczba pakietow na jedna probke (wyswietlane w AV)
         
-        # połączenie z BioSemi
-        device = ActiveTwo(host=host, sfreq=freq, port=port, nchannels=channels,
-                           tcpsamples=tcpsamples)
+        # pylsl potrzebny jest tylko na żywo - odtwarzanie nagrań (odtworz)
+        # zapisuje wyniki do plików i działa bez biblioteki liblsl
+        from pylsl import StreamInfo, StreamOutlet, local_clock
+        self.zegar_wynikow = local_clock
+        
+        self.wczytajUstawienia()
+        indeksy = self.ustalKanaly()
+        
+        # strumień wyjściowy LabStreamLayer do wysyłania poziomów alfy
+        # (wyniki co krokWynikow próbek po decymacji - z tej częstotliwości
+        # LSL wylicza czasy wyników wysłanych razem przez push_chunk)
+        fs = freq / float(self.krokDecymacji(freq))
+        self.czestotliwosc_wynikow = fs / self.krokWynikow(fs)
+        # kanały: moc lewa, prawa i numer kolejny okna (moduły SNAP czytają
+        # dwa pierwsze); double64, żeby numer był dokładny w długim pomiarze
+        info = StreamInfo('BCIAlphaLevel', 'Markers', 3, self.czestotliwosc_wynikow,
+                          'double64', 'neurolab-laptop-1')
+        kanaly = info.desc().append_child('channels')
+        for etykieta in self.nazwyKanalowPoziomow():
+            kanaly.append_child('channel').append_child_value('label', etykieta)
+        self.strumien = StreamOutlet(info, self.PACZKA_LSL, self.BUFOR_LSL)
+        if self.PASMA:
+            self.strumien_pasm = self.utworzStrumienPasm()
+        if self.DODATKOWE_OKNA:
+            self.strumien_okien = self.utworzStrumienOkien()
+        
+        # połączenie z BioSemi; dekodowane są tylko odczytywane kanały
+        if self.OSOBNY_PROCES:
+            # opóźnienia dekodowania nie są mierzone (inny proces)
+            device = ActiveTwoProcess(host=host, sfreq=freq, port=port, nchannels=channels,
+                                      tcpsamples=tcpsamples, channels=indeksy,
+                                      dtype=self.TYP_PROBEK, microvolts=self.MIKROWOLTY)
+        else:
+            device = ActiveTwo(host=host, sfreq=freq, port=port, nchannels=channels,
+                               tcpsamples=tcpsamples, channels=indeksy,
+                               dtype=self.TYP_PROBEK, microvolts=self.MIKROWOLTY,
+                               stats=self.opoznienia.dodaj)
+        
+        self.przetwarzaj(device, freq)
+    
+    
+    def odtworz(self, nagranie, plikWynikow, freq=None):
+        '''analiza nagranego EEG (katalog z plikami raw_eeg_N, plik .npy albo
+           .bdf) tak szybko, jak pozwala procesor, tą samą drogą co na żywo;
+           poziomy alfy zapisywane są do pliku plikWynikow (wiersz na okno,
+           wczytywalny przez np.loadtxt), a moc pasm do pliku z dopiskiem
+           '_pasma'; freq - częstotliwość próbkowania (dla .bdf z nagłówka)
+        '''
+        self.wczytajUstawienia()
+        indeksy = self.ustalKanaly()
+        sygnal, freq = load_recording(nagranie, freq)
+        print 'Odtwarzanie %d s nagrania %s...' % (len(sygnal) // freq, nagranie)
         
+        # nagranie podawane jest porcjami po 1/CZESTOTLIWOSC sekundy, tak jak
+        # zbierałby je ActiveTwo między kolejnymi obiegami analizy
+        zrodlo = Replay(sygnal, freq, 1.0 / self.CZESTOTLIWOSC, channels=indeksy,
+                        dtype=self.TYP_PROBEK, microvolts=self.MIKROWOLTY)
         
+        # wyniki trafiają do plików zamiast do strumieni LabStreamLayer
+        self.strumien = ZapisWynikow(plikWynikow, self.nazwyKanalowPoziomow())
+        if self.PASMA:
+            nazwa, rozszerzenie = os.path.splitext(plikWynikow)
+            self.strumien_pasm = ZapisWynikow(nazwa + '_pasma' + rozszerzenie,
+                                              self.nazwyKanalowPasm())
+        if self.DODATKOWE_OKNA:
+            nazwa, rozszerzenie = os.path.splitext(plikWynikow)
+            self.strumien_okien = ZapisWynikow(nazwa + '_okna' + rozszerzenie,
+                                               self.nazwyKanalowOkien())
+        start = time.time()
+        try:
+            self.przetwarzaj(zrodlo, freq, na_zywo=False)
+        finally:
+            self.strumien.zamknij()
+            if self.PASMA:
+                self.strumien_pasm.zamknij()
+            if self.DODATKOWE_OKNA:
+                self.strumien_okien.zamknij()
+        
+        print 'Przeanalizowano %d okien w %.2f s.' % (self.numer_okna, time.time() - start)
+        print self.opoznienia.raport()
+    
+    
+    def wczytajUstawienia(self):
+        '''nadpisuje ustawienia wartościami z pliku ustawień (jeśli jest)
+        '''
         try:
             if not os.path.exists(self.plikUstawien):
                 print 'Plik ustawień "' + self.plikUstawien + '" nie znaleziony.'
@@ -93,69 +245,466 @@ class EEGAnalyser():
         print self.OKNO_CZASOWE
         print self.CZESTOTLIWOSC
         
+        if self.PASMA and self.METODA != 'fft':
+            print 'Moc pasm PASMA liczona jest tylko dla METODA = \'fft\'.'
+            self.PASMA = []
+        if self.DODATKOWE_OKNA and self.METODA != 'fft':
+            print 'Moc alfy DODATKOWE_OKNA liczona jest tylko dla METODA = \'fft\'.'
+            self.DODATKOWE_OKNA = []
+    
+    
+    def ustalKanaly(self):
+        '''ustala odczytywane kanały: do analizy alfy, a dla strumienia pasm
+           także wszystkie kanały skalpu; zwraca ich numery wśród wszystkich
+           kanałów (dekodowane są tylko one)
+        '''
+        self.kanaly_odczytu = list(self.kanaly_do_analizy)
+        if self.PASMA:
+            self.kanaly_odczytu += [k for k in self.kanaly_skalpu
+                                    if k not in self.kanaly_odczytu]
+        return [self.kanaly_wszystkie.index(k) for k in self.kanaly_odczytu]
+    
+    
+    def przetwarzaj(self, device, freq, na_zywo=True):
+        '''ciągła analiza sygnału z device (ActiveTwo albo Replay) o
+           częstotliwości próbkowania freq; na_zywo=False - bez czekania
+           między obiegami i z analizą w tym samym wątku (każde okno jest
+           analizowane, w kolejności), aż do końca nagrania
+        '''
+        
         ''' -----------------------------------------------------------
             ------------------- CIĄGŁA ANALIZA EEG --------------------
             -----------------------------------------------------------'''
         
-        self.dane_all = np.empty((0,channels))
+        # obliczenia w typie próbek, żeby nie przechodzić na float64 (surowe
+        # wartości całkowite liczymy we float32)
+        typ = device.dtype if np.dtype(device.dtype).kind == 'f' else np.float32
+        
+        # decymacja: dalej (bufor, okna, wyniki) wszystko liczone jest przy
+        # częstotliwości fs = freq / q, a próbki w buforze są typu obliczeń
+        q = self.krokDecymacji(freq)
+        fs = freq
+        self.decymacja = None
+        typ_bufora = device.dtype
+        if q > 1:
+            fs = freq / float(q)
+            self.decymacja = Decymacja(q, typ)
+            typ_bufora = typ
+            print 'Decymacja: analiza przy %g Hz (co %d. probka).' % (fs, q)
+        
+        # wynik liczony jest dokładnie co krok próbek; po przestoju liczone
+        # są zaległe okna, ale najwyżej z zapasu (sekundy) sygnału
+        krok = self.krokWynikow(fs)
+        zapas = int(fs)
+        najwiecej = max(1, zapas // krok)
+        
+        # bufor na ostatnie OKNO_CZASOWE sekund sygnału (albo najdłuższe
+        # z DODATKOWE_OKNA, jeśli dłuższe) i zapas
+        dlugosc_okna = int(self.OKNO_CZASOWE * fs)
+        self.dlugosc_okna = dlugosc_okna
+        self.dlugosci_okien = [int(s * fs) for s in self.DODATKOWE_OKNA]
+        najdluzsze = max([dlugosc_okna] + self.dlugosci_okien)
+        self.bufor = BuforKolowy(najdluzsze + zapas, len(self.kanaly_odczytu), typ_bufora)
+        
+        # plan analizy: numery kolumn, referencja i bazy liczone raz
+        self.plan = PlanAnalizy(fs, self.kanaly_odczytu, self.kanal_lewy,
+                                self.kanal_prawy, self.kanal_referencja,
+                                self.PASMO, self.OKNO, self.PASMA,
+                                self.kanaly_skalpu, typ)
+        
+        if na_zywo:
+            # okna czekające na analizę i wolne tablice na ich kopie (tyle,
+            # ile miejsc w kolejce + po jednej na wątek + jedna wypełniana
+            # teraz, więc zawsze jakaś jest wolna)
+            self.kolejka = Queue.Queue(self.KOLEJKA_ANALIZY)
+            self.wolne_okna = Queue.Queue()
+            for i in range(self.KOLEJKA_ANALIZY + self.WATKI_ANALIZY + 1):
+                self.wolne_okna.put(np.empty((najdluzsze + zapas, len(self.kanaly_odczytu)),
+                                             dtype=typ_bufora))
+            for i in range(self.WATKI_ANALIZY):
+                t = threading.Thread(target=self.watekAnalizy)
+                t.daemon = True
+                t.start()
+        else:
+            # przy odtwarzaniu wyniki nie są wypisywane (tylko zapisywane)
+            self.wypisuj_wyniki = False
+        
+        # metody strumieniowe (dla kanałów mocy z odjętą referencją)
+        if self.METODA in ('sdft', 'iir'):
+            self.strumieniowa = self.utworzMetodeStrumieniowa(fs, dlugosc_okna)
+        
+        # dane z BioSemi odbiera osobny wątek (albo proces), żeby analiza
+        # nigdy nie blokowała odczytu z gniazda TCP
+        device.start()
+        # okno z osobnego procesu czytamy wprost z pamięci współdzielonej
+        # (chyba że sygnał jest decymowany)
+        wspolna = isinstance(device, ActiveTwoProcess) and self.decymacja is None
+        zegar = ZegarProbek(freq)
+        odczytane = 0           # liczba próbek odczytanych przed tym obiegiem
+        probki = 0              # to samo po decymacji
+        od_wyniku = 0           # liczba próbek od końca okna ostatniego wyniku
+        ostatni_raport = clock()
+        wstrzymana = False      # analiza wstrzymana, bo nikt nie odbiera wyników
         while True:
-            # odczytaj dane z BioSemi
-            rawdata = device.read(duration=1.0/self.CZESTOTLIWOSC)
-            # dodaj dane do tablicy zbiorczej
-            self.dane_all = np.concatenate((self.dane_all, rawdata), axis=0)
-            # skróć tablicę jeśli jest dłuższa niż okno czasowe:
-            if len(self.dane_all) > self.OKNO_CZASOWE * freq:
-                self.dane_all = self.dane_all[-self.OKNO_CZASOWE * freq:]
+            # odczytaj dane z BioSemi zebrane od poprzedniego obiegu; przy
+            # wstrzymanej analizie rzadziej, ale dwa razy na okno, żeby
+            # wznowić ją przed upływem jednego okna
+            if na_zywo:
+                time.sleep(self.OKNO_CZASOWE / 2.0 if wstrzymana else 1.0/self.CZESTOTLIWOSC)
+            try:
+                rawdata, czasy = device.drain()
+            except EOFError:
+                # koniec odtwarzanego nagrania
+                return
+            if len(czasy):
+                zegar.dodaj(odczytane + len(czasy) - 1, czasy[-1])
+                if not wstrzymana:
+                    self.opoznienia.dodaj('bufor', clock() - czasy[-1])
+            odczytane += len(czasy)
+            if self.decymacja is not None:
+                # próbka numer i po decymacji to próbka numer q * i
+                rawdata = self.decymacja.dodaj(rawdata)
+            # dodaj dane do bufora (najstarsze próbki są nadpisywane)
+            if not wspolna:
+                self.bufor.dodaj(rawdata)
+            
+            # końce okien kolejnych wyników wśród nowych próbek - co krok
+            # próbek licząc od początku pomiaru, niezależnie od tego, ile
+            # próbek przyniósł ten obieg
+            konce = range(krok - od_wyniku, len(rawdata) + 1, krok)
+            czasy_wynikow = [zegar.czas(q * (probki + k - 1)) for k in konce]
+            od_wyniku = (od_wyniku + len(rawdata)) % krok
+            probki += len(rawdata)
+            
+            if self.RAPORT_OPOZNIEN and clock() - ostatni_raport >= self.RAPORT_OPOZNIEN:
+                print self.opoznienia.raport()
+                if wspolna:
+                    print ('Akwizycja: %(written)d probek, zaleglych %(lag)d, utraconych %(overruns)d, '
+                           'proces dziala: %(alive)s, blad: %(error)s' % device.health())
+                ostatni_raport = clock()
+            
+            if na_zywo:
+                # bez odbiorców wyników sygnał jest tylko buforowany
+                if not self.saOdbiorcy():
+                    if not wstrzymana:
+                        print 'Brak odbiorcow wynikow - analiza wstrzymana.'
+                        wstrzymana = True
+                    continue
+                if wstrzymana:
+                    print 'Odbiorca wynikow podlaczony - analiza wznowiona.'
+                    wstrzymana = False
+                    if self.METODA in ('sdft', 'iir'):
+                        # stan metody strumieniowej jest nieaktualny - liczymy
+                        # go od nowa z okna sprzed nowych próbek
+                        self.strumieniowa = self.utworzMetodeStrumieniowa(fs, dlugosc_okna)
+                        okno = device.window(dlugosc_okna) if wspolna else self.bufor.okno()[-dlugosc_okna:]
+                        self.strumieniowa.dodaj(self.plan.przygotuj(okno[:len(okno) - len(rawdata)]))
             
-            # wprowadz dane do struktury Data (z pakietu wyrm)
-            # czas jest zawsze range(0,ilosc_probek), bo musi jakis byc
-            data = Data(self.dane_all, [range(len(self.dane_all)),
-                                        self.kanaly_wszystkie],
-                        ['czas', 'kanal'], ['ms','nazwa'])
-            data.fs = freq
+            if self.METODA in ('sdft', 'iir'):
+                # wystarczy uaktualnić prążki (albo filtr) nowymi próbkami
+                # - jest to tańsze niż przekazanie okna do wątku analizy;
+                # po przestoju (zebrane próbki z kilku obiegów) zaległe
+                # wyniki wysyłane są razem; przesuwna DFT nie daje wyników,
+                # dopóki okno nie jest pełne
+                poczatek = clock()
+                sygnal = self.plan.przygotuj(rawdata)
+                wyniki = []
+                od = 0
+                for do, czas in zip(konce, czasy_wynikow):
+                    self.strumieniowa.dodaj(sygnal[od:do])
+                    od = do
+                    moc = self.strumieniowa.moc()
+                    if moc is None:
+                        continue
+                    wyniki.append((moc[:self.plan.podzial].sum(),
+                                   moc[self.plan.podzial:].sum(), None, czas, None))
+                self.strumieniowa.dodaj(sygnal[od:])
+                if wyniki:
+                    self.numer_okna += len(wyniki)
+                    self.opoznienia.dodaj('analiza', clock() - poczatek)
+                    self.wyslijWyniki(self.numer_okna, wyniki)
+                continue
             
-            # analizę odsyłamy do osobnego wątku (będzie równolegle
+            if not konce:
+                continue
+            if len(konce) > najwiecej:
+                # po długim przestoju liczymy tylko najnowsze okna
+                self.porzucone_okna += len(konce) - najwiecej
+                self.numer_okna += len(konce) - najwiecej
+                konce = konce[-najwiecej:]
+                czasy_wynikow = czasy_wynikow[-najwiecej:]
+            self.numer_okna += len(konce)
+            
+            # fragment sygnału obejmujący wszystkie okna (końce okien liczone
+            # od jego początku); na początku pomiaru okna są krótsze
+            dlugosc = najdluzsze + len(rawdata) - konce[0]
+            sygnal = device.window(dlugosc) if wspolna else self.bufor.okno()[-dlugosc:]
+            konce = [len(sygnal) - len(rawdata) + k for k in konce]
+            
+            if not na_zywo:
+                # bufor nie zmieni się, dopóki analiza się nie skończy
+                self.analizujOkna(sygnal, konce, self.numer_okna, czasy_wynikow)
+                continue
+            
+            # kopia fragmentu do wolnej tablicy, bo analiza trwa w osobnym
+            # wątku, a bufor jest w tym czasie nadpisywany
+            tablica = self.wolne_okna.get()
+            kopia = tablica[:len(sygnal)]
+            kopia[:] = sygnal
+            
+            # analizę odsyłamy do wątków analizy (będzie równolegle
             # z pobieraniem kolejnej próbki)
-            t = threading.Thread(target=self.analizujEEG, args=(data,))
-            t.start()
+            self.dodajDoKolejki((self.numer_okna, kopia, tablica, konce,
+                                 czasy_wynikow, clock()))
             
         
         
-    def analizujEEG(self, data):
-        '''funkcja odpowiedzialna za analizę EEG:
-           - wyciągnięcie odpowiednich kanałów
-           - obliczenie mocy alfy dla tych kanałów
-           - wysłanie obliczonych wartości do LabStreamLayer
+    def dodajDoKolejki(self, okno):
+        '''wstawia okno do kolejki analizy; jeśli kolejka jest pełna,
+           porzuca najstarsze okno (analizujemy tylko najświeższy sygnał)
         '''
+        while True:
+            try:
+                self.kolejka.put_nowait(okno)
+                return
+            except Queue.Full:
+                try:
+                    tablica = self.kolejka.get_nowait()[2]
+                    self.wolne_okna.put(tablica)
+                    self.porzucone_okna += 1
+                except Queue.Empty:
+                    pass
+    
+    
+    def krokDecymacji(self, freq):
+        '''co która próbka zostaje po decymacji przed analizą: najwięcej,
+           przy której zostaje co najmniej CZESTOTLIWOSC_ANALIZY Hz
+           (1 - bez decymacji)
+        '''
+        if not self.CZESTOTLIWOSC_ANALIZY:
+            return 1
+        return max(1, int(freq // self.CZESTOTLIWOSC_ANALIZY))
+    
+    
+    def krokWynikow(self, freq):
+        '''liczba próbek między kolejnymi wynikami (najbliższa
+           freq / CZESTOTLIWOSC)
+        '''
+        return max(1, int(round(freq / float(self.CZESTOTLIWOSC))))
+    
+    
+    def utworzMetodeStrumieniowa(self, freq, dlugosc_okna):
+        '''przesuwna DFT albo filtr IIR (zależnie od METODA) dla kanałów
+           mocy alfy, bez żadnych próbek
+        '''
+        if self.METODA == 'sdft':
+            return PrzesuwnaDFT(freq, dlugosc_okna, len(self.plan.kolumny),
+                                self.PASMO[0], self.PASMO[1], self.OKNO)
+        return ObwiedniaIIR(freq, len(self.plan.kolumny), self.PASMO[0],
+                            self.PASMO[1], self.STALA_CZASOWA)
+    
+    
+    def saOdbiorcy(self):
+        '''czy ktoś (np. moduł SNAP) odbiera wyniki: poziomy alfy albo moc pasm
+        '''
+        if self.strumien.have_consumers():
+            return True
+        if self.DODATKOWE_OKNA and self.strumien_okien.have_consumers():
+            return True
+        return bool(self.PASMA) and self.strumien_pasm.have_consumers()
+    
+    
+    def utworzStrumienPasm(self):
+        '''tworzy strumień LabStreamLayer z mocą pasm PASMA wszystkich
+           kanałów skalpu: kolejno wszystkie kanały pierwszego pasma, potem
+           drugiego itd.; nazwy kanałów (np. 'F3_alpha') i granice pasm są
+           w opisie strumienia
+        '''
+        from pylsl import StreamInfo, StreamOutlet
+        info = StreamInfo('BCIBandPower', 'EEG',
+                          len(self.PASMA) * len(self.kanaly_skalpu),
+                          self.czestotliwosc_wynikow, 'float32', 'neurolab-laptop-1-pasma')
+        opis = info.desc()
+        opis.append_child_value('reference', self.kanal_referencja)
+        opis.append_child_value('window', str(self.OKNO))
+        pasma = opis.append_child('bands')
+        for nazwa, od, do in self.PASMA:
+            pasmo = pasma.append_child('band')
+            pasmo.append_child_value('label', nazwa)
+            pasmo.append_child_value('low', str(od))
+            pasmo.append_child_value('high', str(do))
+        kanaly = opis.append_child('channels')
+        etykiety = iter(self.nazwyKanalowPasm())
+        for nazwa, _, _ in self.PASMA:
+            for k in self.kanaly_skalpu:
+                kanal = kanaly.append_child('channel')
+                kanal.append_child_value('label', next(etykiety))
+                kanal.append_child_value('electrode', k)
+                kanal.append_child_value('band', nazwa)
+                kanal.append_child_value('type', 'BandPower')
+                kanal.append_child_value('unit', 'microvolts' if self.MIKROWOLTY else 'counts')
+        return StreamOutlet(info, self.PACZKA_LSL, self.BUFOR_LSL)
+    
+    
+    def nazwyKanalowPoziomow(self):
+        '''nazwy kanałów poziomów alfy: kanały lewe, prawe (np. 'F3', 'F4')
+           i numer kolejny okna wyniku
+        '''
+        return ['+'.join(self.kanal_lewy), '+'.join(self.kanal_prawy), 'numer']
+    
+    
+    def nazwyKanalowPasm(self):
+        '''nazwy kanałów mocy pasm w kolejności wysyłania (np. 'F3_alpha')
+        '''
+        return ['%s_%s' % (k, nazwa) for nazwa, _, _ in self.PASMA
+                for k in self.kanaly_skalpu]
+    
+    
+    def utworzStrumienOkien(self):
+        '''tworzy strumień LabStreamLayer z poziomami alfy (lewy, prawy)
+           z okien DODATKOWE_OKNA, kolejno dla każdej długości okna; nazwy
+           kanałów (np. 'lewy_0.25s') i długości okien są w opisie strumienia
+        '''
+        from pylsl import StreamInfo, StreamOutlet
+        info = StreamInfo('BCIAlphaLevels', 'Markers', 2 * len(self.DODATKOWE_OKNA),
+                          self.czestotliwosc_wynikow, 'float32', 'neurolab-laptop-1-okna')
+        opis = info.desc()
+        opis.append_child_value('reference', self.kanal_referencja)
+        opis.append_child_value('window', str(self.OKNO))
+        kanaly = opis.append_child('channels')
+        etykiety = iter(self.nazwyKanalowOkien())
+        for dlugosc in self.DODATKOWE_OKNA:
+            for strona, elektrody in (('left', self.kanal_lewy), ('right', self.kanal_prawy)):
+                kanal = kanaly.append_child('channel')
+                kanal.append_child_value('label', next(etykiety))
+                kanal.append_child_value('side', strona)
+                kanal.append_child_value('electrodes', ','.join(elektrody))
+                kanal.append_child_value('length', str(dlugosc))
+                kanal.append_child_value('type', 'AlphaLevel')
+        return StreamOutlet(info, self.PACZKA_LSL, self.BUFOR_LSL)
+    
+    
+    def nazwyKanalowOkien(self):
+        '''nazwy kanałów poziomów alfy dodatkowych okien w kolejności
+           wysyłania (np. 'lewy_0.25s', 'prawy_0.25s', 'lewy_2s', ...)
+        '''
+        return ['%s_%gs' % (strona, dlugosc) for dlugosc in self.DODATKOWE_OKNA
+                for strona in ('lewy', 'prawy')]
+    
+    
+    def watekAnalizy(self):
+        '''wątek analizy: pobiera kolejne okna z kolejki i je analizuje
+        '''
+        while True:
+            numer, sygnal, tablica, konce, czasy, wstawione = self.kolejka.get()
+            self.opoznienia.dodaj('kolejka', clock() - wstawione)
+            try:
+                self.analizujOkna(sygnal, konce, numer, czasy)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                # tablica z kopią okna może być użyta ponownie
+                self.wolne_okna.put(tablica)
+            
         
-        # wycinamy tylko potrzebne kanały i ustalamy referencję
-        data = proc.select_channels(data, self.kanaly_do_analizy)
-        data = proc.rereference(data, self.kanal_referencja)
-        
-        # wycinamy odpowiednie kanały
-        data_lewy = proc.select_channels(data, self.kanal_lewy)
-        data_prawy = proc.select_channels(data, self.kanal_prawy)
-        
-        # nakładamy okno Hanninga
-        window = sp.hanning(len(data_lewy.data))
-        data_lewy.data = np.array([a*b for a,b in zip(data_lewy.data,window)])
-        data_prawy.data = np.array([a*b for a,b in zip(data_prawy.data,window)])
-        
-        # obliczamy transformatę Fouriera
-        data_lewy = proc.spectrum(data_lewy)
-        data_prawy = proc.spectrum(data_prawy)
         
-        # obliczamy moc (sumując wartości z przedziału 8-12 Hz)
-        # data[0] = 1 Hz; data[7] = 8 Hz
-        [moc_lewy] = sum(data_lewy.data[7:11])
-        [moc_prawy] = sum(data_prawy.data[7:11])
+    def analizujOkna(self, sygnal, konce, numer, czasy=None):
+        '''funkcja odpowiedzialna za analizę EEG okien sygnału (próbki x
+           kanaly_odczytu) kończących się przed próbkami konce - każde
+           długości OKNO_CZASOWE (krótsze tylko na początku pomiaru):
+           - wyciągnięcie odpowiednich kanałów i odjęcie referencji
+           - obliczenie mocy alfy dla tych kanałów (i mocy pasm PASMA dla
+             wszystkich kanałów skalpu, i mocy alfy okien DODATKOWE_OKNA)
+           - wysłanie obliczonych wartości do LabStreamLayer, razem
+           numer - numer kolejny okna ostatniego wyniku (wyniki starsze od
+           już wysłanych są pomijane)
+           czasy - czasy (clock) zapisania ostatnich próbek okien, do
+           pomiaru całkowitego opóźnienia
+        '''
+        # wszystkie kroki (kanały, referencja, okno, transformata, suma
+        # prążków z przedziału PASMO Hz) wykonuje plan przygotowany przy
+        # starcie - bezpośrednio na tablicach, bez struktur wyrm
+        poczatek = clock()
+        wyniki = []
+        for koniec, czas in zip(konce, czasy or [None] * len(konce)):
+            okna = None
+            if self.dlugosci_okien:
+                # moc alfy dodatkowych okien: ostatnie próbki najdłuższego
+                # z nich, przygotowanego raz (zanim analizuj nadpisze
+                # tablicę roboczą)
+                najdluzsze = sygnal[max(0, koniec - max(self.dlugosci_okien)):koniec]
+                robocza = self.plan.przygotuj(najdluzsze, tylko_alfa=True)
+                okna = []
+                for n in self.dlugosci_okien:
+                    okna.extend(self.plan.mocAlfy(robocza[-n:]))
+            okno = sygnal[max(0, koniec - self.dlugosc_okna):koniec]
+            wyniki.append(self.plan.analizuj(okno) + (czas, okna))
+        self.opoznienia.dodaj('analiza', clock() - poczatek)
         
-        # wrzuć poziomy do strumienia
-        self.strumien.push_sample([moc_lewy, moc_prawy])
-        print str(moc_lewy) + "  " + str(moc_prawy)
+        self.wyslijWyniki(numer, wyniki)
+    
+    
+    def wyslijWyniki(self, numer, wyniki):
+        '''wysyła do LabStreamLayer kolejne wyniki (lista: moc_lewy,
+           moc_prawy, pasma albo None, czas_probki, poziomy alfy dodatkowych
+           okien albo None) - kilka naraz przez
+           push_chunk; znacznik czasu to czas ostatniej próbki okna
+           przeliczony na zegar LabStreamLayer (local_clock, zegar_wynikow)
+           numer - numer kolejny okna ostatniego wyniku (wyniki starsze od
+           już wysłanych są pomijane); numery kolejnych wyników wysyłane są
+           w trzecim kanale poziomów alfy
+        '''
+        czas_probki = wyniki[-1][3]
+        numery = range(numer - len(wyniki) + 1, numer + 1)
+        # wrzuć poziomy do strumienia (przy kilku wątkach analizy wynik
+        # starszego okna może być gotowy później niż nowszego)
+        with self.blokada_wyniku:
+            if numer < self.ostatni_wynik:
+                self.porzucone_wyniki += len(wyniki)
+                return
+            self.ostatni_wynik = numer
+            poczatek = clock()
+            # 0.0 - LabStreamLayer użyje czasu wysłania; czas próbki jest
+            # w zegarze pyactivetwo, więc dodajemy różnicę obu zegarów
+            znacznik = 0.0
+            if czas_probki is not None:
+                znacznik = czas_probki + (self.zegar_wynikow() - poczatek)
+            poziomy = [[w[0], w[1], n] for w, n in zip(wyniki, numery)]
+            if len(poziomy) == 1:
+                self.strumien.push_sample(poziomy[0], znacznik)
+            else:
+                self.strumien.push_chunk(poziomy, znacznik)
+            pasma = [w[2].ravel().tolist() for w in wyniki if w[2] is not None]
+            if len(pasma) == 1:
+                self.strumien_pasm.push_sample(pasma[0], znacznik)
+            elif pasma:
+                self.strumien_pasm.push_chunk(pasma, znacznik)
+            okna = [w[4] for w in wyniki if w[4] is not None]
+            if len(okna) == 1:
+                self.strumien_okien.push_sample(okna[0], znacznik)
+            elif okna:
+                self.strumien_okien.push_chunk(okna, znacznik)
+            koniec = clock()
+        self.opoznienia.dodaj('wysylanie', koniec - poczatek)
+        if czas_probki is not None:
+            self.opoznienia.dodaj('calkowite', koniec - czas_probki)
+        if self.wypisuj_wyniki:
+            for moc_lewy, moc_prawy, n in poziomy:
+                print '%s  %s  %s  (porzucone okna: %d, wyniki: %d)' % (
+                    n, moc_lewy, moc_prawy,
+                    self.porzucone_okna, self.porzucone_wyniki)
 
 
 
 if __name__ == '__main__':
-    EEGAnalyser().start()
+    # uruchamiane z katalogu src jako moduł (python -m analyser.analyser),
+    # żeby były widoczne pakiety pyactivetwo, wyrm i pylsl:
+    # bez argumentów: analiza na żywo (ActiView)
+    # NAGRANIE WYNIKI [FREQ]: odtworzenie nagrania i zapis wyników do pliku
+    # (bez pylsl)
+    if len(sys.argv) > 2:
+        EEGAnalyser().odtworz(sys.argv[1], sys.argv[2],
+                              *[int(a) for a in sys.argv[3:4]])
+    else:
+        EEGAnalyser().start()
 
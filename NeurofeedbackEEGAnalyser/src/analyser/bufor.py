@@ -0,0 +1,57 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Bufor kołowy na ostatnie próbki EEG, z którego analiza bierze okno czasowe.
+
+"""
+
+import numpy as np
+
+
+class BuforKolowy():
+    '''bufor kołowy o stałym rozmiarze (alokowany raz, na starcie)
+    
+    Każda próbka jest zapisywana dwa razy: na pozycji i oraz i + dlugosc.
+    Dzięki temu ostatnie dlugosc próbek zawsze leży w pamięci w jednym
+    kawałku i okno() zwraca widok tablicy, bez kopiowania i sklejania.
+    '''
+    
+    def __init__(self, dlugosc, kanaly, typ=np.float64):
+        '''dlugosc - liczba próbek w oknie, kanaly - liczba kanałów,
+           typ - typ próbek (np. int32 prosto z ActiveTwo)
+        '''
+        self.dlugosc = dlugosc
+        self.dane = np.zeros((2 * dlugosc, kanaly), dtype=typ)
+        self.pozycja = 0   # gdzie trafi następna próbka (0 .. dlugosc-1)
+        self.zapisane = 0  # ile próbek zapisano od początku
+    
+    
+    def dodaj(self, probki):
+        '''dopisuje próbki (macierz próbki x kanały), nadpisując najstarsze
+        '''
+        self.zapisane += len(probki)
+        # więcej próbek niż mieści bufor - liczą się tylko ostatnie
+        probki = probki[-self.dlugosc:]
+        n = len(probki)
+        
+        # część mieszcząca się do końca bufora i część zawinięta na początek
+        n1 = min(n, self.dlugosc - self.pozycja)
+        n2 = n - n1
+        for poczatek in (self.pozycja, self.pozycja + self.dlugosc):
+            self.dane[poczatek:poczatek + n1] = probki[:n1]
+        for poczatek in (0, self.dlugosc):
+            self.dane[poczatek:poczatek + n2] = probki[n1:]
+        self.pozycja = (self.pozycja + n) % self.dlugosc
+    
+    
+    def okno(self, pelne=False):
+        '''widok na ostatnie próbki (od najstarszej do najnowszej); dopóki
+           bufor się nie zapełni, okno jest krótsze niż dlugosc, chyba że
+           pelne = True (wtedy brakujące próbki na początku są zerami)
+        '''
+        n = self.dlugosc if pelne else min(self.zapisane, self.dlugosc)
+        koniec = self.pozycja + self.dlugosc
+        return self.dane[koniec - n:koniec]
@@ -0,0 +1,62 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Decymacja sygnału przed analizą: moc pasm do ok. 30 Hz nie wymaga
+transformaty okna próbkowanego z pełną częstotliwością BioSemi.
+
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import signal
+
+
+class Decymacja():
+    '''strumieniowa decymacja wielofazowa z filtrem antyaliasingowym
+    
+    Sygnał filtrowany jest dolnoprzepustowo filtrem FIR (jak w
+    scipy.signal.resample_poly: okno Kaisera, pasmo do nowej częstotliwości
+    Nyquista) i zostaje co q-ta próbka. Filtr liczony jest tylko dla
+    zostawianych próbek, a ostatnie próbki i faza pamiętane są między
+    wywołaniami, więc wynik nie zależy od podziału sygnału na porcje.
+    Zostawiane są próbki o numerach (od początku sygnału) 0, q, 2q, ...
+    '''
+    
+    def __init__(self, q, typ=np.float32):
+        '''q - co która próbka zostaje, typ - typ obliczeń i wyniku
+        '''
+        self.q = q
+        self.typ = typ
+        h = signal.firwin(20 * q + 1, 1.0 / q, window=('kaiser', 5.0))
+        # odwrócony, bo mnożony jest przez próbki od najstarszej
+        self.h = h[::-1].astype(typ)
+        self.historia = None    # ostatnie len(h) - 1 próbek
+        self.faza = 0           # numer (w nowych próbkach) pierwszej zostawianej
+    
+    
+    def dodaj(self, probki):
+        '''filtruje nowe próbki (macierz próbki x kanały); zwraca próbki
+           po decymacji (być może żadnej)
+        '''
+        n = len(probki)
+        if n == 0:
+            return probki.astype(self.typ)
+        t = len(self.h)
+        if self.historia is None:
+            # przed pierwszą próbką sygnał jest stały (bez stanu
+            # nieustalonego od składowej stałej)
+            self.historia = np.repeat(probki[:1].astype(self.typ), t - 1, axis=0)
+        x = np.concatenate([self.historia, probki.astype(self.typ)])
+        
+        # okna filtru kolejnych zostawianych próbek - widok bez kopiowania
+        k = len(range(self.faza, n, self.q))
+        okna = as_strided(x[self.faza:], shape=(k, t, x.shape[1]),
+                          strides=(self.q * x.strides[0],) + x.strides)
+        wynik = np.einsum('ktc,t->kc', okna, self.h)
+        
+        self.faza = (self.faza - n) % self.q
+        self.historia = x[n:]
+        return wynik
@@ -0,0 +1,229 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Obliczanie mocy pasma (np. alfy 8-12 Hz) bez liczenia pełnej transformaty
+Fouriera całego okna przy każdej aktualizacji.
+
+"""
+
+import numpy as np
+from scipy import fftpack, signal
+
+import wyrm.processing as proc
+from bufor import BuforKolowy
+from okna import WSPOLCZYNNIKI, okno, nalozOkno
+
+
+# bazy DFT policzone przez bazaPasma (klucz: fs, długość okna, pasmo, okno, typ)
+_bazy = {}
+# macierze sumujące prążki pasm (klucz: fs, długość okna, pasma, typ)
+_pasma = {}
+
+
+def biny(fs, n, od, do):
+    '''numery prążków transformaty n-próbkowego okna (przy częstotliwości
+       próbkowania fs), które należą do pasma [od, do) Hz
+    '''
+    k = np.arange(n // 2)
+    return k[(k * float(fs) / n >= od) & (k * float(fs) / n < do)]
+
+
+def bazaPasma(fs, n, od, do, typ=np.float64, rodzaj='hann'):
+    '''macierz (2 * prążki x n), która mnożona przez okno sygnału (próbki x
+       kanały) daje części rzeczywiste i urojone prążków pasma [od, do) Hz
+       - z nałożonym oknem danego rodzaju (patrz okna.okno) i przeskalowane
+       tak jak amplitudy w proc.spectrum; liczona raz dla danych parametrów
+    '''
+    klucz = (fs, n, od, do, rodzaj, np.dtype(typ))
+    if klucz not in _bazy:
+        kat = 2 * np.pi * np.outer(biny(fs, n, od, do), np.arange(n)) / n
+        baza = np.vstack([np.cos(kat), -np.sin(kat)])
+        baza *= okno(n, rodzaj) * (2.0 / n)
+        _bazy[klucz] = baza.astype(typ)
+    return _bazy[klucz]
+
+
+def mocPasma(okno, baza):
+    '''moc pasma dla każdego kanału okna (próbki x kanały): suma amplitud
+       prążków pasma, baza z bazaPasma
+    '''
+    prazki = np.dot(baza, okno)
+    n = len(prazki) // 2
+    return np.hypot(prazki[:n], prazki[n:]).sum(axis=0)
+
+
+def macierzPasm(fs, n, pasma, typ=np.float64):
+    '''macierz (pasma x prążki rfft), która mnożona przez amplitudy rfft
+       n-próbkowego okna daje sumy amplitud prążków każdego z pasm;
+       pasma - lista (nazwa, od, do); liczona raz dla danych parametrów
+    '''
+    klucz = (fs, n, tuple(tuple(p) for p in pasma), np.dtype(typ))
+    if klucz not in _pasma:
+        macierz = np.zeros((len(pasma), n // 2 + 1), dtype=typ)
+        for i, (_, od, do) in enumerate(pasma):
+            macierz[i, biny(fs, n, od, do)] = 1
+        _pasma[klucz] = macierz
+    return _pasma[klucz]
+
+
+def mocPasm(okno, fs, pasma, rodzaj='hann'):
+    '''moc wielu pasm dla każdego kanału okna (próbki x kanały) z jednej
+       transformaty rfft wszystkich kanałów naraz; wynik: pasma x kanały,
+       w tej samej skali co mocPasma; UWAGA: okno jest nadpisywane
+       (w miejscu nakładany jest na nie taper)
+    '''
+    # scipy.fftpack.rfft zachowuje typ okna (np.fft.rfft liczy zawsze
+    # w complex128); wynik: [Re0, Re1, Im1, Re2, Im2, ...]
+    n = len(okno)
+    widmo = fftpack.rfft(nalozOkno(okno, rodzaj), axis=0)
+    amplitudy = np.empty((n // 2 + 1,) + widmo.shape[1:], dtype=widmo.dtype)
+    np.abs(widmo[0], out=amplitudy[0])
+    pary = (n - 1) // 2
+    np.hypot(widmo[1:2 * pary:2], widmo[2:2 * pary + 1:2], out=amplitudy[1:pary + 1])
+    if n % 2 == 0:
+        np.abs(widmo[n - 1], out=amplitudy[n // 2])
+    amplitudy *= 2.0 / n
+    return np.dot(macierzPasm(fs, n, pasma, widmo.dtype), amplitudy)
+
+
+class PrzesuwnaDFT():
+    '''moc pasma z przesuwnej transformaty Fouriera (sliding DFT)
+    
+    Transformata okna X(w) = suma x[i] exp(-j w i) (i = 0 dla najstarszej
+    próbki) jest aktualizowana rekurencyjnie każdą nową próbką:
+    X(w) <- exp(j w) (X(w) - najstarsza) + nowa * exp(-j w (n - 1)).
+    Koszt aktualizacji zależy tylko od liczby nowych próbek i śledzonych
+    częstotliwości, nie od długości okna, więc moc można liczyć nawet po
+    każdej próbce.
+    
+    Okno kosinusowe (Hanninga, Hamminga lub Blackmana, symetryczne jak
+    okna.okno) nakładane jest w dziedzinie częstotliwości: dla okna
+    Hanninga X_hann(w_k) = 0.5 X(w_k) - 0.25 X(w_k - d) - 0.25 X(w_k + d),
+    gdzie w_k = 2 pi k / n to prążki pasma, a d = 2 pi / (n - 1). Wynik
+    jest więc taki sam (z dokładnością do zaokrągleń) jak mocPasma okna
+    z analizy FFT. Dopóki okno nie jest pełne, moc() zwraca None (analiza
+    FFT liczy wtedy krótsze okno, którego tu nie ma jak odtworzyć). Okna
+    'dpss' nie da się tak nałożyć.
+    '''
+    
+    def __init__(self, fs, n, kanaly, od=8, do=12, rodzaj='hann'):
+        '''fs - częstotliwość próbkowania, n - długość okna w próbkach,
+           kanaly - liczba kanałów, [od, do) - pasmo w Hz, rodzaj - okno
+        '''
+        if rodzaj not in WSPOLCZYNNIKI:
+            raise ValueError('Przesuwna DFT nie obsługuje okna %r' % (rodzaj,))
+        self.n = n
+        self.pasmo = biny(fs, n, od, do)
+        self.wspolczynniki = WSPOLCZYNNIKI[rodzaj]
+        # śledzone częstotliwości: prążki pasma przesunięte o -p .. p
+        # okresów okna symetrycznego (wiersz p to same prążki pasma)
+        self.margines = len(self.wspolczynniki) - 1
+        przesuniecia = np.arange(-self.margines, self.margines + 1)
+        self.omega = (2 * np.pi * self.pasmo / n
+                      + 2 * np.pi * przesuniecia[:, np.newaxis] / (n - 1)).ravel()
+        # obrót nowej próbki: exp(-j w (n - 1)) = exp(j w) exp(-j w n)
+        self.obrot_nowych = np.exp(-1j * n * self.omega)[:, np.newaxis]
+        
+        # próbki w oknie (przed zapełnieniem okna - zera)
+        self.bufor = BuforKolowy(n, kanaly)
+        # transformata okna (częstotliwości x kanały)
+        self.X = np.zeros((len(self.omega), kanaly), dtype=np.complex128)
+        # baza DFT do dokładnego przeliczenia transformaty (kasuje błędy
+        # zaokrągleń narastające w rekurencji)
+        self.baza = np.exp(-1j * np.outer(self.omega, np.arange(n)))
+        self.od_przeliczenia = 0
+    
+    
+    def dodaj(self, probki):
+        '''aktualizuje transformatę o nowe próbki (macierz próbki x kanały)
+        '''
+        m = len(probki)
+        if m == 0:
+            return
+        if m >= self.n or self.od_przeliczenia + m >= self.n:
+            # raz na długość okna liczymy transformatę od nowa
+            self.bufor.dodaj(probki)
+            self.X = np.dot(self.baza, self.bufor.okno(pelne=True))
+            self.od_przeliczenia = 0
+            return
+        
+        # m kroków rekurencji naraz: i-ta (od zera) wypadająca i nowa
+        # próbka są obracane o (m - i) kroków (nowa dodatkowo o -n), a stara
+        # transformata o m kroków; wypadające próbki trzeba wziąć z bufora,
+        # zanim zostaną nadpisane nowymi
+        kroki = np.arange(m, 0, -1)
+        fazy = np.exp(1j * np.outer(self.omega, kroki))
+        wypadajace = np.dot(fazy, self.bufor.okno(pelne=True)[:m])
+        self.bufor.dodaj(probki)
+        self.X = (self.X * np.exp(1j * m * self.omega)[:, np.newaxis]
+                  + np.dot(fazy, probki) * self.obrot_nowych - wypadajace)
+        self.od_przeliczenia += m
+    
+    
+    def moc(self):
+        '''moc pasma dla każdego kanału: suma amplitud 2|X_okno|/n prążków
+           pasma; None, dopóki okno nie jest pełne
+        '''
+        if self.bufor.zapisane < self.n:
+            return None
+        p = self.margines
+        X = self.X.reshape(2 * p + 1, len(self.pasmo), -1)
+        okno = self.wspolczynniki[0] * X[p]
+        for m in range(1, p + 1):
+            okno += 0.5 * self.wspolczynniki[m] * (X[p - m] + X[p + m])
+        return (2 * np.abs(okno) / self.n).sum(axis=0)
+
+
+class ObwiedniaIIR():
+    '''moc pasma ze strumieniowego filtru pasmowoprzepustowego IIR
+    
+    Sygnał każdego kanału przechodzi przez filtr Butterwortha (sekcje
+    drugiego rzędu, stan filtru pamiętany między wywołaniami), jest
+    podnoszony do kwadratu i wygładzany wykładniczo ze stałą czasową tau.
+    Koszt aktualizacji jest stały na próbkę, a wynik nie ma opóźnienia
+    połowy okna jak transformata okna (tylko opóźnienie grupowe filtru
+    i wygładzania). Wynik to moc (kwadrat amplitudy), nie suma amplitud
+    prążków jak w mocPasma.
+    '''
+    
+    def __init__(self, fs, kanaly, od=8, do=12, tau=0.25, rzad=4):
+        '''fs - częstotliwość próbkowania, kanaly - liczba kanałów, [od, do)
+           - pasmo w Hz, tau - stała czasowa wygładzania w s, rzad - rząd
+           filtru Butterwortha
+        '''
+        nyquist = fs / 2.0
+        self.sos = signal.butter(rzad, [od / nyquist, do / nyquist],
+                                 btype='band', output='sos')
+        self.kanaly = kanaly
+        # stan filtru ustalany przy pierwszych próbkach (bez stanu
+        # nieustalonego od składowej stałej sygnału)
+        self.zi = None
+        # wygładzanie: m[i] = m[i-1] + a (y[i]^2 - m[i-1])
+        a = 1 - np.exp(-1.0 / (tau * fs))
+        self.b_wygladzania = np.array([a])
+        self.a_wygladzania = np.array([1, a - 1])
+        self.zi_wygladzania = np.zeros((1, kanaly))
+        self.wartosc = np.zeros(kanaly)
+    
+    
+    def dodaj(self, probki):
+        '''przepuszcza nowe próbki (macierz próbki x kanały) przez filtr
+        '''
+        if len(probki) == 0:
+            return
+        if self.zi is None:
+            self.zi = proc.sosfilt_zi(self.sos, self.kanaly) * probki[0]
+        y, self.zi = signal.sosfilt(self.sos, probki, axis=0, zi=self.zi)
+        y *= y
+        m, self.zi_wygladzania = signal.lfilter(self.b_wygladzania, self.a_wygladzania,
+                                                y, axis=0, zi=self.zi_wygladzania)
+        self.wartosc = m[-1]
+    
+    
+    def moc(self):
+        '''wygładzona moc pasma dla każdego kanału
+        '''
+        return self.wartosc
@@ -0,0 +1,78 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Okna (tapery) nakładane na sygnał przed transformatą Fouriera. Każde okno
+jest liczone raz dla danej długości i rodzaju, a potem brane z pamięci.
+
+"""
+
+import numpy as np
+from scipy import signal
+from scipy.linalg import eigh_tridiagonal
+
+
+# okna kosinusowe w wersji symetrycznej (jak sp.hanning, którego używała
+# analiza FFT): w[i] = a0 - a1 cos(2 pi i / (n - 1)) + a2 cos(4 pi i / (n - 1));
+# współczynniki (a0, -a1, a2) pozwalają nałożyć okno w dziedzinie
+# częstotliwości (patrz moc.PrzesuwnaDFT)
+WSPOLCZYNNIKI = {'hann': (0.5, -0.5),
+                 'hamming': (0.54, -0.46),
+                 'blackman': (0.42, -0.5, 0.08)}
+
+# szerokość pasma (NW) okna 'dpss', jeśli nie podano jej jawnie
+DPSS_NW = 2.5
+
+# policzone okna float64 (klucz: długość, rodzaj) i ich kopie w innych
+# typach (klucz: długość, rodzaj, typ)
+_okna = {}
+_okna_typy = {}
+
+
+def _dpss(n, nw):
+    '''pierwsza dyskretna sekwencja sferoidalna (okno Slepiana) długości n
+       i szerokości pasma nw - wektor własny macierzy trójdiagonalnej
+       o największej wartości własnej (liczony tylko ten jeden, bez
+       budowania pełnej macierzy), przeskalowany do maksimum 1
+    '''
+    i = np.arange(n)
+    przekatna = ((n - 1 - 2 * i) / 2.0) ** 2 * np.cos(2 * np.pi * float(nw) / n)
+    obok = i[1:] * (n - i[1:]) / 2.0
+    _, wektory = eigh_tridiagonal(przekatna, obok, select='i', select_range=(n - 1, n - 1))
+    wektor = wektory[:, 0]
+    return wektor / wektor[np.argmax(np.abs(wektor))]
+
+
+def okno(n, rodzaj='hann', typ=np.float64):
+    '''okno długości n: 'hann', 'hamming', 'blackman' (symetryczne, jak
+       sp.hanning) albo 'dpss' / ('dpss', NW) (okno Slepiana); zwracana
+       tablica jest współdzielona - nie wolno jej zmieniać
+    '''
+    klucz = (n, rodzaj, np.dtype(typ))
+    if klucz in _okna_typy:
+        return _okna_typy[klucz]
+    if (n, rodzaj) not in _okna:
+        if rodzaj in WSPOLCZYNNIKI:
+            wartosci = signal.get_window(rodzaj, n, fftbins=False)
+        elif rodzaj == 'dpss':
+            wartosci = _dpss(n, DPSS_NW)
+        elif isinstance(rodzaj, tuple) and rodzaj[0] == 'dpss':
+            wartosci = _dpss(n, rodzaj[1])
+        else:
+            raise ValueError('Nieznane okno: %r' % (rodzaj,))
+        wartosci.flags.writeable = False
+        _okna[n, rodzaj] = wartosci
+    # okno w innym typie to tylko kopia okna float64 (liczonego raz)
+    wartosci = _okna[n, rodzaj].astype(typ)
+    wartosci.flags.writeable = False
+    _okna_typy[klucz] = wartosci
+    return wartosci
+
+
+def nalozOkno(dane, rodzaj='hann'):
+    '''mnoży w miejscu sygnał (próbki x kanały) przez okno danego rodzaju
+    '''
+    dane *= okno(len(dane), rodzaj, dane.dtype)[:, np.newaxis]
+    return dane
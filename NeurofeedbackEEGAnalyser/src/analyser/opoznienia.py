@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Pomiar opóźnień kolejnych etapów przetwarzania (odbiór i dekodowanie,
+buforowanie, kolejka, analiza, wysyłanie do LabStreamLayer). Dla każdego
+etapu pamiętane są ostatnie pomiary, z których liczone są percentyle.
+
+"""
+
+import threading
+
+import numpy as np
+
+
+class Opoznienia():
+    '''ostatnie pomiary opóźnień (w s) każdego etapu w tablicach kołowych
+    
+    Dodanie pomiaru to jeden zapis do tablicy, więc pomiar może być
+    włączony cały czas. Pomiary mogą być dodawane z wielu wątków.
+    '''
+    
+    def __init__(self, dlugosc=1000):
+        '''dlugosc - ile ostatnich pomiarów każdego etapu jest pamiętanych
+        '''
+        self.dlugosc = dlugosc
+        self.etapy = []      # nazwy etapów w kolejności pierwszego pomiaru
+        self.pomiary = {}    # etap -> tablica kołowa pomiarów
+        self.liczniki = {}   # etap -> liczba wszystkich pomiarów
+        self.blokada = threading.Lock()
+    
+    
+    def dodaj(self, etap, sekundy):
+        '''zapamiętuje opóźnienie (w s) etapu
+        '''
+        with self.blokada:
+            if etap not in self.pomiary:
+                self.etapy.append(etap)
+                self.pomiary[etap] = np.zeros(self.dlugosc)
+                self.liczniki[etap] = 0
+            licznik = self.liczniki[etap]
+            self.pomiary[etap][licznik % self.dlugosc] = sekundy
+            self.liczniki[etap] = licznik + 1
+    
+    
+    def percentyle(self, procenty=(50, 95, 99)):
+        '''lista (etap, liczba pomiarów, percentyle w ms) z ostatnich pomiarów
+           każdego etapu
+        '''
+        with self.blokada:
+            kopie = [(etap, self.liczniki[etap],
+                      self.pomiary[etap][:self.liczniki[etap]].copy())
+                     for etap in self.etapy]
+        return [(etap, licznik, np.percentile(pomiary, procenty) * 1000)
+                for etap, licznik, pomiary in kopie]
+    
+    
+    def raport(self):
+        '''tabela percentyli (p50, p95, p99 w ms) wszystkich etapów
+        '''
+        wiersze = ['%-12s %9s %9s %9s %9s' % ('opoznienia', 'pomiary', 'p50 [ms]', 'p95 [ms]', 'p99 [ms]')]
+        for etap, licznik, (p50, p95, p99) in self.percentyle():
+            wiersze.append('%-12s %9d %9.3f %9.3f %9.3f' % (etap, licznik, p50, p95, p99))
+        return '\n'.join(wiersze)
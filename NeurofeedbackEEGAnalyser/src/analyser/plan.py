@@ -0,0 +1,101 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Plan analizy okna EEG przygotowany raz przy starcie: numery kolumn kanałów,
+bazy DFT i macierze pasm są liczone z góry, a każda aktualizacja to kilka
+operacji na tablicach numpy (bez struktur wyrm i wyszukiwania kanałów po
+nazwach).
+
+"""
+
+import threading
+
+import numpy as np
+
+from moc import bazaPasma, mocPasma, mocPasm
+
+
+class PlanAnalizy():
+    '''analiza okna (próbki x odczytane kanały) według ustawień EEGAnalyser
+    
+    Używane kanały są kopiowane z okna do tablicy roboczej od razu z odjętą
+    referencją (kolumna po kolumnie, bez tymczasowych tablic), a potem moc
+    alfy i pasm liczona jest na widokach tej tablicy. Każdy wątek ma własną
+    tablicę roboczą, więc jeden plan może być używany przez kilka wątków.
+    '''
+    
+    def __init__(self, fs, kanaly, lewy, prawy, referencja, pasmo,
+                 rodzaj='hann', pasma=None, skalp=None, typ=np.float32):
+        '''fs - częstotliwość próbkowania, kanaly - nazwy kolumn okna,
+           lewy, prawy - listy kanałów mocy alfy, referencja - nazwa kanału
+           referencyjnego, pasmo - (od, do) mocy alfy, rodzaj - okno,
+           pasma - lista (nazwa, od, do) dla kanałów skalp (albo None),
+           typ - typ obliczeń (float)
+        '''
+        self.fs = fs
+        self.pasmo = pasmo
+        self.rodzaj = rodzaj
+        self.pasma = pasma
+        self.typ = np.dtype(typ)
+        
+        self.referencja = kanaly.index(referencja)
+        # kolumny tablicy roboczej: kanały mocy alfy, potem kanały skalpu
+        self.alfa = [kanaly.index(k) for k in lewy + prawy]
+        self.skalp = [kanaly.index(k) for k in skalp] if pasma else []
+        self.kolumny = self.alfa + self.skalp
+        self.podzial = len(lewy)
+        
+        self._watki = threading.local()
+    
+    
+    def robocza(self, n):
+        '''tablica robocza (n x używane kolumny) bieżącego wątku; powiększana
+           tylko wtedy, gdy jest za krótka
+        '''
+        tablica = getattr(self._watki, 'tablica', None)
+        if tablica is None or len(tablica) < n:
+            tablica = np.empty((n, len(self.kolumny)), dtype=self.typ)
+            self._watki.tablica = tablica
+        return tablica[:n]
+    
+    
+    def przygotuj(self, okno, tylko_alfa=False):
+        '''używane kanały okna z odjętą referencją (w tablicy roboczej, typ
+           obliczeń); kolumny: kanały mocy alfy, potem (chyba że tylko_alfa)
+           kanały skalpu
+        '''
+        robocza = self.robocza(len(okno))
+        referencja = okno[:, self.referencja]
+        kolumny = self.alfa if tylko_alfa else self.kolumny
+        for i, k in enumerate(kolumny):
+            np.subtract(okno[:, k], referencja, out=robocza[:, i])
+        return robocza[:, :len(kolumny)]
+    
+    
+    def analizuj(self, okno):
+        '''moc alfy (lewy, prawy) i moc pasm (pasma x kanały skalpu albo
+           None) dla okna (próbki x odczytane kanały)
+        '''
+        robocza = self.przygotuj(okno)
+        moc_lewy, moc_prawy = self.mocAlfy(robocza)
+        
+        pasma = None
+        if self.pasma:
+            # taper jest nakładany w miejscu, ale na kolumny skalpu tablicy
+            # roboczej, które nie są już potrzebne
+            pasma = mocPasm(robocza[:, len(self.alfa):], self.fs, self.pasma, self.rodzaj)
+        return moc_lewy, moc_prawy, pasma
+    
+    
+    def mocAlfy(self, robocza):
+        '''moc alfy (lewy, prawy) okna przygotowanego przez przygotuj (także
+           ostatnich próbek takiego okna - baza DFT każdej długości okna
+           liczona jest raz)
+        '''
+        baza = bazaPasma(self.fs, len(robocza), self.pasmo[0], self.pasmo[1],
+                         self.typ, self.rodzaj)
+        moc = mocPasma(robocza[:, :len(self.alfa)], baza)
+        return moc[:self.podzial].sum(), moc[self.podzial:].sum()
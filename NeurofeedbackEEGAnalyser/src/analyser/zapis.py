@@ -0,0 +1,42 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Zapis wyników analizy do pliku tekstowego zamiast do strumienia
+LabStreamLayer (np. przy odtwarzaniu nagrań).
+
+"""
+
+
+class ZapisWynikow():
+    '''plik wyników z tą samą metodą push_sample co pylsl.StreamOutlet:
+       wiersz na próbkę, wartości oddzielone tabulatorami, w pierwszym
+       wierszu (komentarz '#') nazwy kanałów - plik wczytuje np.loadtxt
+    '''
+    
+    def __init__(self, sciezka, kanaly):
+        '''sciezka - plik wyników (nadpisywany), kanaly - nazwy kanałów
+        '''
+        self.plik = open(sciezka, 'w')
+        self.plik.write('# ' + '\t'.join(kanaly) + '\n')
+    
+    
+    def push_sample(self, x, timestamp=0.0, pushthrough=True):
+        '''zapisuje wiersz wartości x (timestamp i pushthrough są pomijane)
+        '''
+        self.plik.write('\t'.join('%.9g' % v for v in x) + '\n')
+    
+    
+    def push_chunk(self, x, timestamp=0.0, pushthrough=True):
+        '''zapisuje wiersze wartości (lista list, jak push_chunk strumienia)
+        '''
+        for wiersz in x:
+            self.push_sample(wiersz)
+    
+    
+    def zamknij(self):
+        '''zamyka plik wyników
+        '''
+        self.plik.close()
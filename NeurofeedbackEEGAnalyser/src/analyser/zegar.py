@@ -0,0 +1,47 @@
+# -*- coding: UTF-8 -*-
+
+"""
+
+Procedura: AlphaNeurofeedback
+
+Zegar próbek: czasy wyników wyliczane z numerów próbek, a nie z chwil
+odebrania pakietów TCP (bez rozrzutu wnoszonego przez sieć i pakiety).
+
+"""
+
+
+class ZegarProbek():
+    '''czas próbki o danym numerze: poczatek + numer / fs
+    
+    Pakiety docierają z opóźnieniem, które się zmienia, ale nigdy nie jest
+    ujemne, więc najlepszym oszacowaniem początku jest najmniejsza różnica
+    (czas odebrania - numer / fs). Zegar wzmacniacza może jednak chodzić
+    nieco wolniej niż zegar komputera (wtedy te różnice rosną), dlatego
+    oszacowanie może też rosnąć, ale najwyżej o dryf sekund na sekundę.
+    '''
+    
+    def __init__(self, fs, dryf=1e-4):
+        '''fs - częstotliwość próbkowania, dryf - największa różnica
+           szybkości zegarów (1e-4 = 100 ppm)
+        '''
+        self.fs = float(fs)
+        self.dryf = dryf
+        self.poczatek = None    # czas (clock) próbki numer 0
+        self.ostatni = None     # czas ostatniego pomiaru
+    
+    
+    def dodaj(self, numer, czas):
+        '''pomiar: próbka numer (licząc od 0) odebrana w chwili czas
+        '''
+        poczatek = czas - numer / self.fs
+        if self.poczatek is None:
+            self.poczatek = poczatek
+        else:
+            self.poczatek = min(poczatek, self.poczatek + self.dryf * (czas - self.ostatni))
+        self.ostatni = czas
+    
+    
+    def czas(self, numer):
+        '''czas (clock) próbki numer
+        '''
+        return self.poczatek + numer / self.fs
@@ -9,9 +9,389 @@ https://batchloaf.wordpress.com/2014/01/17/real-time-analysis-of-data-from-biose
 
 """
 
+import ctypes
+import multiprocessing
+import select
 import socket
+import threading
+import time
 import numpy as np
 
+try:
+    from time import monotonic as clock
+except ImportError:
+    # Python 2: best available timer of the platform
+    from timeit import default_timer as clock
+
+#: BioSemi resolution: microvolts per unit of the 24-bit value
+MICROVOLTS_PER_UNIT = 0.03125
+
+
+def gather_index(nsamples, nchannels, channels=None):
+    """
+    Byte offsets of the selected values in raw ActiView TCP data, for decode.
+    Every 3-byte value is gathered together with the byte preceding it, into a 4-byte word
+    from which the decoder shifts that byte out again.
+    :param nsamples: Number of samples
+    :param nchannels: Number of channels in every sample
+    :param channels: Indices of the channels to decode (default: all)
+    :return: Array samples x selected channels x 4 of byte offsets
+    """
+    if channels is None:
+        channels = np.arange(nchannels)
+    values = np.arange(nsamples)[:, np.newaxis] * nchannels + np.asarray(channels)[np.newaxis, :]
+    # the very first value has no preceding byte, its offset -1 is clipped to 0 by decode
+    return (values * 3 - 1)[:, :, np.newaxis] + np.arange(4)
+
+
+def decode(data, nchannels, out=None, channels=None, index=None, words=None):
+    """
+    Decode raw ActiView TCP data into signal values
+    :param data: Bytes received from ActiView (str, bytearray or numpy uint8 array), a whole number of samples long
+    :param nchannels: Number of channels in every sample
+    :param out: Optional array (samples x selected channels) to store the signal in
+    :param channels: Indices of the channels to decode (default: all)
+    :param index: Optional gather_index for at least as many samples, reused between calls (overrides channels)
+    :param words: Optional uint8 scratch array (samples x selected channels x 4), reused between calls
+    :return: Signal in the matrix form: samples x selected channels (int32)
+    """
+
+    raw = np.frombuffer(data, dtype=np.uint8)
+    nsamples = len(raw) // (nchannels * 3)
+    if index is None:
+        index = gather_index(nsamples, nchannels, channels)
+    else:
+        index = index[:nsamples]
+    if words is not None:
+        words = words[:nsamples]
+
+    # Gather the 3 bytes of every value into the upper part of a little-endian 32-bit word,
+    # so that the arithmetic shift back by 8 bits extends the sign of the 24-bit value
+    words = np.take(raw, index, mode='clip', out=words)
+    return np.right_shift(words.view('<i4')[:, :, 0], 8, out=out)
+
+
+class PacketReader():
+    """
+    Reassembles ActiView packets from the TCP byte stream and decodes them.
+    Partial packets are kept between reads, so no data is lost when TCP splits or merges packets.
+    """
+
+    #: Number of bytes received from the socket
+    bytes_received = 0
+
+    #: Number of whole packets decoded
+    packets_decoded = 0
+
+    #: Number of calls to resync (misalignment is not detected: the stream has no packet markers)
+    resyncs = 0
+
+    #: Clock time at which data was last received from the socket
+    received = None
+
+    def __init__(self, sock, nchannels, tcpsamples, channels=None, dtype=np.float64, microvolts=False,
+                 packets=64):
+        """
+        Initialize the receive buffer
+        :param sock: Connected socket to read from
+        :param nchannels: Number of channels in every sample
+        :param tcpsamples: Number of samples in one packet
+        :param channels: Indices of the channels to decode (default: all)
+        :param dtype: Type of the returned signal (e.g. int32 for raw values, float32 for microvolts)
+        :param microvolts: Scale the signal to microvolts (floating point dtype only)
+        :param packets: Capacity of the receive buffer in packets
+        """
+        self.dtype = np.dtype(dtype)
+        if microvolts and self.dtype.kind != 'f':
+            raise ValueError('Signal in microvolts needs a floating point dtype, not %s' % self.dtype)
+        self.s = sock
+        self.nchannels = nchannels
+        self.tcpsamples = tcpsamples
+        self.channels = list(range(nchannels)) if channels is None else list(channels)
+        self.microvolts = microvolts
+        self.packet_size = nchannels * tcpsamples * 3
+
+        # receive buffer: filled through the memoryview, decoded through the array view
+        self._buffer = bytearray(self.packet_size * packets)
+        self._view = memoryview(self._buffer)
+        self._bytes = np.frombuffer(self._buffer, dtype=np.uint8)
+        # bytes waiting in the buffer are _buffer[_start:_fill]; they are moved to the front only
+        # when the space after them cannot hold a whole packet
+        self._start = 0
+        self._fill = 0
+        # decoding buffers for the whole receive buffer
+        self._index = gather_index(tcpsamples * packets, nchannels, self.channels)
+        self._words = np.zeros(self._index.shape, dtype=np.uint8)
+
+    def _receive(self):
+        """
+        Receive whatever is available from the socket into the free part of the buffer
+        """
+        if len(self._buffer) - self._fill < self.packet_size:
+            pending = self._fill - self._start
+            # less than a packet is waiting (read and read_available receive only then)
+            self._view[:pending] = self._view[self._start:self._fill].tobytes()
+            self._start, self._fill = 0, pending
+        nbytes = self.s.recv_into(self._view[self._fill:], len(self._buffer) - self._fill)
+        if nbytes == 0:
+            raise socket.error('Connection closed by ActiView')
+        self.received = clock()
+        self._fill += nbytes
+        self.bytes_received += nbytes
+
+    def _consume(self, nbytes):
+        """
+        Drop the first nbytes of the waiting data (without moving the rest)
+        """
+        self._start += nbytes
+        if self._start == self._fill:
+            self._start = self._fill = 0
+
+    def resync(self):
+        """
+        Discard all data waiting in the buffer, so that the next read starts from fresh data
+        (e.g. after ActiView was restarted and packet boundaries are no longer known)
+        """
+        self._start = self._fill = 0
+        self.resyncs += 1
+
+    def _decode(self, packets, out):
+        """
+        Decode packets from the beginning of the waiting data into out and drop them from the buffer
+        """
+        nbytes = packets * self.packet_size
+        decode(self._bytes[self._start:self._start + nbytes], self.nchannels, out=out, index=self._index,
+               words=self._words)
+        if self.microvolts:
+            out *= MICROVOLTS_PER_UNIT
+        self._consume(nbytes)
+        self.packets_decoded += packets
+
+    def read(self, out):
+        """
+        Fill out with decoded samples, blocking until enough packets arrive
+        :param out: Array (samples x channels) to fill, samples must be a multiple of tcpsamples
+        :return: out
+        """
+        if len(out) % self.tcpsamples:
+            raise ValueError('Can only read whole packets of %d samples' % self.tcpsamples)
+
+        samples = 0
+        while samples < len(out):
+            while self._fill - self._start < self.packet_size:
+                self._receive()
+            # decode all complete packets at once (but not more than needed)
+            packets = min((self._fill - self._start) // self.packet_size, (len(out) - samples) // self.tcpsamples)
+            nsamples = packets * self.tcpsamples
+            self._decode(packets, out[samples:samples + nsamples])
+            samples += nsamples
+
+        return out
+
+    def read_available(self):
+        """
+        Receive once (blocking only if the socket has no data) and decode all complete packets
+        :return: Signal in the matrix form: samples x channels (no rows if no packet was completed)
+        """
+        self._receive()
+        packets = (self._fill - self._start) // self.packet_size
+        out = np.empty((packets * self.tcpsamples, len(self.channels)), dtype=self.dtype)
+        self._decode(packets, out)
+        return out
+
+
+class SampleRing():
+    """
+    Circular buffer of samples with their arrival timestamps, written by one producer thread.
+    The producer publishes new samples only by increasing the written counter after they are
+    stored, so consumers read without locks and only have to check that the samples they
+    copied were not overwritten in the meantime.
+    """
+
+    #: Total number of samples written so far
+    written = 0
+
+    #: Number of samples lost because drain was not called often enough
+    overruns = 0
+
+    def __init__(self, capacity, nchannels, chunk, dtype=np.float64):
+        """
+        Allocate the buffer
+        :param capacity: Number of samples kept
+        :param nchannels: Number of channels in every sample
+        :param chunk: Largest number of samples written at once
+        :param dtype: Type of the samples
+        """
+        self.capacity = capacity
+        self.chunk = chunk
+        self.data = np.zeros((capacity, nchannels), dtype=dtype)
+        self.timestamps = np.zeros(capacity)
+        # position (in written samples) up to which drain has returned the data
+        self._drained = 0
+
+    def write(self, samples, timestamp):
+        """
+        Store samples received at the same time (called by the producer only)
+        :param samples: Signal in the matrix form: samples x channels
+        :param timestamp: Arrival time of the samples (clock)
+        """
+        n = len(samples)
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.timestamps[start:start + first] = timestamp
+        self.timestamps[:n - first] = timestamp
+        # publish the samples
+        self.written += n
+
+    def _copy(self, start, end):
+        """
+        Copy samples written between start and end
+        :return: (signal, timestamps) or None if the producer overwrote them while copying
+        """
+        positions = np.arange(start, end) % self.capacity
+        data = self.data.take(positions, axis=0)
+        timestamps = self.timestamps.take(positions)
+        # the producer may already be storing its next chunk
+        if self.written + self.chunk - start > self.capacity:
+            return None
+        return data, timestamps
+
+    def latest(self, n_samples):
+        """
+        Get the most recent samples without waiting
+        :param n_samples: How many samples to get (fewer are returned if not available yet)
+        :return: Signal in the matrix form: samples x channels + arrival timestamps of the samples
+        """
+        n_samples = min(n_samples, self.capacity - self.chunk)
+        while True:
+            end = self.written
+            copied = self._copy(max(0, end - n_samples), end)
+            if copied is not None:
+                return copied
+
+    def drain(self):
+        """
+        Get all samples written since the previous drain without waiting
+        :return: Signal in the matrix form: samples x channels + arrival timestamps of the samples
+        """
+        while True:
+            end = self.written
+            # samples older than the buffer can safely hold are lost
+            start = max(self._drained, end - self.capacity + self.chunk)
+            copied = self._copy(start, end)
+            if copied is not None:
+                self.overruns += start - self._drained
+                self._drained = end
+                return copied
+
+
+class SharedSampleRing(SampleRing, object):
+    """
+    SampleRing in memory shared between processes: the acquisition process writes, the analysis
+    process drains. The samples are stored twice (the second copy right after the first), so the
+    most recent samples can always be read as one contiguous view, without copying (see window).
+    The ring is passed to the acquisition process as a multiprocessing.Process argument.
+    The clocks of the two processes may differ (on Python 2 under Windows clock counts from
+    the first call in each process), so the producer adds clock_offset to its timestamps,
+    which are then in the consumer's clock.
+    """
+
+    def __init__(self, capacity, nchannels, chunk, dtype=np.float64):
+        """
+        Allocate the shared buffer
+        :param capacity: Number of samples kept
+        :param nchannels: Number of channels in every sample
+        :param chunk: Largest number of samples written at once
+        :param dtype: Type of the samples
+        """
+        self.capacity = capacity
+        self.chunk = chunk
+        self.nchannels = nchannels
+        self.dtype = np.dtype(dtype)
+        self._raw_data = multiprocessing.RawArray(ctypes.c_char, 2 * capacity * nchannels * self.dtype.itemsize)
+        self._raw_timestamps = multiprocessing.RawArray(ctypes.c_double, capacity)
+        # written index, published by the producer after the samples are stored
+        self._written = multiprocessing.RawValue(ctypes.c_longlong, 0)
+        # clock time of the last write
+        self._heartbeat = multiprocessing.RawValue(ctypes.c_double, 0)
+        # consumer's clock minus producer's clock
+        self._clock_offset = multiprocessing.RawValue(ctypes.c_double, 0)
+        self._attach()
+        self._drained = 0
+
+    def _attach(self):
+        """
+        Create the numpy views of the shared memory
+        """
+        self.data = np.frombuffer(self._raw_data, dtype=self.dtype).reshape(2 * self.capacity, self.nchannels)
+        self.timestamps = np.frombuffer(self._raw_timestamps)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['data'], state['timestamps']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    @property
+    def written(self):
+        """
+        Total number of samples written so far (by any process)
+        """
+        return self._written.value
+
+    @property
+    def heartbeat(self):
+        """
+        Clock time (of the consumer) at which the producer last wrote samples (0 before the first write)
+        """
+        return self._heartbeat.value
+
+    @property
+    def clock_offset(self):
+        """
+        Seconds added to the producer's timestamps: consumer's clock minus producer's clock
+        """
+        return self._clock_offset.value
+
+    @clock_offset.setter
+    def clock_offset(self, seconds):
+        self._clock_offset.value = seconds
+
+    def write(self, samples, timestamp):
+        """
+        Store samples received at the same time, in both copies (called by the producer only)
+        :param samples: Signal in the matrix form: samples x channels
+        :param timestamp: Arrival time of the samples (clock of the producer)
+        """
+        timestamp += self._clock_offset.value
+        n = len(samples)
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            self.data[offset + start:offset + start + first] = samples[:first]
+            self.data[offset:offset + n - first] = samples[first:]
+        self.timestamps[start:start + first] = timestamp
+        self.timestamps[:n - first] = timestamp
+        # publish the samples (a single aligned 64-bit store)
+        self._written.value += n
+        self._heartbeat.value = timestamp
+
+    def window(self, n_samples):
+        """
+        Get the most recent drained samples without copying. The view stays valid until the producer
+        writes capacity - n_samples more samples, so it should be used (or copied) before the next drain.
+        :param n_samples: How many samples to get (fewer are returned if not available yet)
+        :return: Signal in the matrix form: samples x channels (view of the shared memory)
+        """
+        n_samples = min(n_samples, self._drained, self.capacity - self.chunk)
+        start = (self._drained - n_samples) % self.capacity
+        return self.data[start:start + n_samples]
+
 
 class ActiveTwo():
     """
@@ -27,15 +407,33 @@ class ActiveTwo():
     #: Number of channles
     nchannels = None
 
+    #: Indices of the channels decoded and returned
+    channels = None
+
     #: Data packet size (default: 32 channels @ 512Hz)
     buffer_size = None
 
-    def __init__(self, host='127.0.0.1', sfreq=512, port=778, nchannels=32, tcpsamples=4):
+    #: Samples decoded by the background reader (see start)
+    ring = None
+
+    #: Exception which stopped the background reader (raised by drain once its samples are drained)
+    error = None
+
+    #: Callable stats(stage, seconds) receiving latencies measured by the background reader
+    stats = None
+
+    def __init__(self, host='127.0.0.1', sfreq=512, port=778, nchannels=32, tcpsamples=4, channels=None,
+                 dtype=np.float64, microvolts=False, stats=None):
         """
         Initialize connection and parameters of the signal
         :param host: IP address where ActiView is running
         :param port: Port ActiView is listening on
         :param nchannels: Number of EEG channels
+        :param channels: Indices of the channels to decode, in the order they are returned (default: all)
+        :param dtype: Type of the returned signal: e.g. int32 for raw values (the device sends 24-bit integers)
+        :param microvolts: Return the signal in microvolts instead of raw values (floating point dtype, e.g. float32)
+        :param stats: Optional callable stats(stage, seconds), called by the background reader for every packet
+                      with the 'decode' latency: from receiving its last bytes to storing it in the ring
         """
 
         # store parameters
@@ -44,52 +442,276 @@ class ActiveTwo():
         self.nchannels = nchannels
         self.sfreq = sfreq
         self.tcpsamples = tcpsamples
+        self.channels = list(range(nchannels)) if channels is None else list(channels)
         self.buffer_size = self.nchannels * self.tcpsamples * 3
+        self.stats = stats
 
         # open connection
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.s.connect((self.host, self.port))
+        self.reader = PacketReader(self.s, self.nchannels, self.tcpsamples, self.channels, dtype, microvolts)
+        self.dtype = self.reader.dtype
+
+    def samples_to_read(self, duration):
+        """
+        Number of samples returned by read (whole packets covering the duration)
+        :param duration: How long to read in seconds
+        :return: Number of samples
+        """
+        packets = int(np.ceil(duration * self.sfreq / self.tcpsamples))
+        return packets * self.tcpsamples
 
-    def read(self, duration):
+    def read(self, duration, out=None):
         """
         Read signal from the EEG device
         :param duration: How long to read in seconds
-        :return: Signal in the matrix form: samples x channels + timestamps in ms since start
+        :param out: Optional array (samples_to_read(duration) x channels) to fill instead of a new one
+        :return: Signal in the matrix form: samples x channels
         """
 
-        # initialize final data array
-        rawdata = np.empty((0,self.nchannels))
+        shape = (self.samples_to_read(duration), len(self.channels))
+        if out is None:
+            out = np.empty(shape, dtype=self.dtype)
+        elif out.shape != shape:
+            raise ValueError('out has shape %s, expected %s' % (out.shape, shape))
 
-        # The reader process will run until requested amount of data is collected
-        samples = 0
-        while samples < duration * self.sfreq:
-            # Create a 16-sample signal_buffer
-            signal_buffer = np.zeros((self.nchannels, self.tcpsamples))
-            # Read the next packet from the network
-            # sometimes there is an error and packet is smaller than needed, read until get a good one
-            data = []
-            while len(data) != self.buffer_size:
-                data = self.s.recv(self.buffer_size)
-            # Extract 16 samples from the packet (ActiView sends them in 16-sample chunks)
-            for m in range(self.tcpsamples):
-                # extract samples for each channel
-                for ch in range(self.nchannels):
-                    offset = m * 3 * self.nchannels + (ch * 3)
-
-                    # The 3 bytes of each sample arrive in reverse order
-                    sample = (ord(data[offset+2]) << 16)
-                    sample += (ord(data[offset+1]) << 8)
-                    sample += ord(data[offset])
-
-                    # Store sample to signal buffer
-                    signal_buffer[ch, m] = sample
-            # update sample counter
-            samples += self.tcpsamples
-
-            # transpose matrix so that rows are samples
-            signal_buffer = np.transpose(signal_buffer)
-
-            # add to the final dataset
-            rawdata = np.concatenate((rawdata, signal_buffer), axis=0)
-            
-        return rawdata
+        return self.reader.read(out)
+
+    def start(self, seconds=10):
+        """
+        Start reading the signal continuously in a background thread
+        :param seconds: How much signal the background buffer keeps
+        """
+        self.ring = SampleRing(int(seconds * self.sfreq), len(self.channels), self.tcpsamples, self.dtype)
+        self._running = True
+        self._thread = threading.Thread(target=self._acquire)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background reader (waits for the packet being read)
+        """
+        self._running = False
+        self._thread.join()
+
+    def _acquire(self):
+        """
+        Background reader: decode packets into the ring as soon as they arrive, until stopped or until
+        reading or decoding fails (the exception is kept in error)
+        """
+        packet = np.empty((self.tcpsamples, len(self.channels)), dtype=self.dtype)
+        try:
+            while self._running:
+                self.reader.read(packet)
+                now = clock()
+                self.ring.write(packet, now)
+                if self.stats is not None:
+                    self.stats('decode', now - self.reader.received)
+        except Exception as e:
+            self.error = e
+
+    def latest(self, n_samples):
+        """
+        Get the most recent samples collected by the background reader, without waiting
+        :param n_samples: How many samples to get (fewer are returned if not available yet)
+        :return: Signal in the matrix form: samples x channels + arrival timestamps of the samples
+        """
+        return self.ring.latest(n_samples)
+
+    def drain(self):
+        """
+        Get all samples collected by the background reader since the previous drain, without waiting.
+        Once the reader has stopped and everything it collected has been drained, raises the exception
+        which stopped it (socket.error after stop).
+        :return: Signal in the matrix form: samples x channels + arrival timestamps of the samples
+        """
+        if not self._thread.is_alive() and self.ring.written == self.ring._drained:
+            raise self.error or socket.error('Background reader stopped')
+        return self.ring.drain()
+
+
+#: Indices in the clock synchronisation array shared by ActiveTwoProcess and its acquisition process
+PING, PONG, PONG_CLOCK, SYNCED = range(4)
+
+
+def _answer_clock(sync):
+    """
+    Acquisition process side of the clock synchronisation: answer every ping with the clock
+    of this process, until the parent sets SYNCED
+    """
+    while not sync[SYNCED]:
+        ping = sync[PING]
+        if ping != sync[PONG]:
+            sync[PONG_CLOCK] = clock()
+            sync[PONG] = ping
+        else:
+            time.sleep(0)
+
+
+def _acquire_process(parameters, ring, error, sync):
+    """
+    Acquisition process of ActiveTwoProcess: synchronise clocks with the parent, then connect
+    and decode packets into the shared ring until the connection fails (the exception is passed
+    back through error)
+    """
+    try:
+        _answer_clock(sync)
+        device = ActiveTwo(**parameters)
+        device.ring = ring
+        device._running = True
+        device._acquire()
+        if device.error is not None:
+            raise device.error
+    except Exception as e:
+        error.value = repr(e)[:len(error) - 1]
+
+
+class ActiveTwoProcess():
+    """
+    ActiveTwo reading and decoding the signal in a separate process, so that the analysis does not
+    compete with it for the GIL and its garbage collection pauses do not delay the socket reads.
+    Samples are passed through a SharedSampleRing; latest and drain work as in ActiveTwo, window
+    gives the recent samples without copying and health reports the state of both processes.
+    """
+
+    #: Samples decoded by the acquisition process (see start)
+    ring = None
+
+    #: Acquisition process
+    process = None
+
+    #: Number of ping-pong rounds used to measure the clock offset to the acquisition process
+    sync_rounds = 50
+
+    def __init__(self, host='127.0.0.1', sfreq=512, port=778, nchannels=32, tcpsamples=4, channels=None,
+                 dtype=np.float64, microvolts=False):
+        """
+        Store the parameters; the acquisition process connects to ActiView when started
+        (see ActiveTwo for the parameters, latencies are not measured across processes)
+        """
+        self.parameters = dict(host=host, sfreq=sfreq, port=port, nchannels=nchannels, tcpsamples=tcpsamples,
+                               channels=channels, dtype=dtype, microvolts=microvolts)
+        self.sfreq = sfreq
+        self.tcpsamples = tcpsamples
+        self.channels = list(range(nchannels)) if channels is None else list(channels)
+        self.dtype = np.dtype(dtype)
+        # repr of the exception which stopped the acquisition process
+        self._error = multiprocessing.RawArray(ctypes.c_char, 256)
+
+    def start(self, seconds=10):
+        """
+        Start the acquisition process
+        :param seconds: How much signal the shared buffer keeps
+        """
+        self.ring = SharedSampleRing(int(seconds * self.sfreq), len(self.channels), self.tcpsamples, self.dtype)
+        sync = multiprocessing.RawArray(ctypes.c_double, 4)
+        self.process = multiprocessing.Process(target=_acquire_process,
+                                               args=(self.parameters, self.ring, self._error, sync))
+        self.process.daemon = True
+        self.process.start()
+        self.ring.clock_offset = self._sync_clock(sync)
+        sync[SYNCED] = 1
+
+    def _sync_clock(self, sync):
+        """
+        Measure the offset between the clocks of this and of the acquisition process: ask for the
+        other clock several times and keep the answer with the shortest round trip
+        :return: This process's clock minus the acquisition process's clock (0 if it does not answer)
+        """
+        best_offset, best_trip = 0.0, None
+        for ping in range(1, self.sync_rounds + 1):
+            sent = clock()
+            sync[PING] = ping
+            while sync[PONG] != ping:
+                if not self.process.is_alive():
+                    return best_offset
+                time.sleep(0)
+            received = clock()
+            if best_trip is None or received - sent < best_trip:
+                best_trip = received - sent
+                best_offset = (sent + received) / 2.0 - sync[PONG_CLOCK]
+        return best_offset
+
+    def stop(self):
+        """
+        Stop the acquisition process
+        """
+        self.process.terminate()
+        self.process.join()
+
+    def latest(self, n_samples):
+        """
+        Get the most recent samples collected by the acquisition process, without waiting
+        :param n_samples: How many samples to get (fewer are returned if not available yet)
+        :return: Signal in the matrix form: samples x channels + arrival timestamps of the samples
+        """
+        return self.ring.latest(n_samples)
+
+    def drain(self):
+        """
+        Get all samples collected by the acquisition process since the previous drain, without waiting.
+        Once the process has stopped and everything it collected has been drained, raises socket.error
+        with the exception which stopped it.
+        :return: Signal in the matrix form: samples x channels + arrival timestamps of the samples
+        """
+        if not self.process.is_alive() and self.ring.written == self.ring._drained:
+            raise socket.error(self._error.value or 'Acquisition process stopped')
+        return self.ring.drain()
+
+    def window(self, n_samples):
+        """
+        Get the most recent drained samples without copying (see SharedSampleRing.window)
+        :param n_samples: How many samples to get (fewer are returned if not available yet)
+        :return: Signal in the matrix form: samples x channels (view of the shared memory)
+        """
+        return self.ring.window(n_samples)
+
+    def health(self):
+        """
+        State of the acquisition and of the analysis reading from it
+        :return: dict with written (samples written by the acquisition process), lag (samples written
+                 but not drained yet), overruns (samples lost because drain was too late), silence
+                 (seconds since the last write, None before the first one), alive (whether the
+                 acquisition process runs) and error (why it stopped, None if it did not)
+        """
+        written = self.ring.written
+        heartbeat = self.ring.heartbeat
+        return {'written': written,
+                'lag': written - self.ring._drained,
+                'overruns': self.ring.overruns,
+                'silence': clock() - heartbeat if heartbeat else None,
+                'alive': self.process.is_alive(),
+                'error': self._error.value or None}
+
+
+class ActiveTwoGroup():
+    """
+    Reads several ActiveTwo devices (e.g. ActiView servers of a multi-amplifier rig) from one thread,
+    waiting on all their sockets at once
+    """
+
+    def __init__(self, devices):
+        """
+        :param devices: Connected ActiveTwo objects
+        """
+        self.devices = list(devices)
+
+    def blocks(self, timeout=None):
+        """
+        Iterate over signal blocks as they arrive from any of the devices
+        :param timeout: Stop iterating if no device sends anything for this many seconds (default: never stop)
+        :return: Iterator of (device, signal in the matrix form: samples x channels)
+        """
+        devices = dict((device.s, device) for device in self.devices)
+        while True:
+            readable, _, _ = select.select(list(devices), [], [], timeout)
+            if not readable:
+                return
+            for s in readable:
+                signal = devices[s].reader.read_available()
+                if len(signal):
+                    yield devices[s], signal
+
+    def __iter__(self):
+        return self.blocks()
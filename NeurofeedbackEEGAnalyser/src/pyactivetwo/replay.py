@@ -0,0 +1,168 @@
+"""
+
+Python BioSemi ActiveTwo: replay of recorded signal
+
+Serves a recording (raw_eeg_N text dumps, a .npy array or a BDF file) through the reading
+interface of ActiveTwo (read, start, latest, drain) without any pacing, so that the code
+analysing a live signal can process a recording as fast as the CPU allows.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+
+import numpy as np
+
+from pyactivetwo.pyactivetwo import MICROVOLTS_PER_UNIT, clock, decode, gather_index
+from pyactivetwo.simulator import load_raw_eeg
+
+#: How many bytes of a BDF file read_bdf reads and decodes at a time
+BDF_BLOCK_BYTES = 1 << 20
+
+
+def read_bdf(filename):
+    """
+    Read a BDF file (24-bit EDF written by ActiView); all channels must have the same sampling rate
+    :param filename: Path of the BDF file
+    :return: Signal in the matrix form: samples x channels (int32, BioSemi units) + sampling rate
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(256)
+        nchannels = int(header[252:256])
+        duration = float(header[244:252])
+        channel_header = f.read(256 * nchannels)
+
+        # per channel fields: label, transducer, dimension, 4 ranges, prefiltering, then samples per record
+        offset = nchannels * (16 + 80 + 8 + 4 * 8 + 80)
+        per_record = set(int(channel_header[offset + 8 * i:offset + 8 * (i + 1)]) for i in range(nchannels))
+        if len(per_record) != 1:
+            raise ValueError('Channels of %s have different sampling rates' % filename)
+        per_record = per_record.pop()
+
+        # every record holds per_record values of the first channel, then of the second one and so on,
+        # i.e. the ActiView TCP layout with channels and samples swapped; records are read and decoded
+        # a block at a time (reusing the decode buffers) straight into the signal, so that only the
+        # signal itself is file-sized
+        record_bytes = nchannels * per_record * 3
+        nrecords = (os.fstat(f.fileno()).st_size - f.tell()) // record_bytes
+        signal = np.empty((nrecords * per_record, nchannels), dtype=np.int32)
+        block = max(1, BDF_BLOCK_BYTES // record_bytes)
+        index = gather_index(block * nchannels, per_record)
+        words = np.zeros(index.shape, dtype=np.uint8)
+        for first in range(0, nrecords, block):
+            n = min(block, nrecords - first)
+            values = decode(f.read(n * record_bytes), per_record, index=index, words=words)
+            signal[first * per_record:(first + n) * per_record].reshape(n, per_record, nchannels)[:] = \
+                values.reshape(n, nchannels, per_record).transpose(0, 2, 1)
+    return signal, per_record / duration
+
+
+def load_recording(path, sfreq=None):
+    """
+    Load a recording: directory with raw_eeg_N files, .npy array (samples x channels) or .bdf file
+    :param path: Path of the recording
+    :param sfreq: Sampling rate (required unless it is stored in the file, as in BDF)
+    :return: Signal in the matrix form: samples x channels + sampling rate
+    """
+    if path.lower().endswith('.bdf'):
+        signal, file_sfreq = read_bdf(path)
+        return signal, int(round(file_sfreq)) if sfreq is None else sfreq
+    if sfreq is None:
+        raise ValueError('Sampling rate of %s is not known' % path)
+    if os.path.isdir(path):
+        return load_raw_eeg(path), sfreq
+    return np.load(path), sfreq
+
+
+class Replay():
+    """
+    Recorded signal read like ActiveTwo. Every drain returns the samples recorded during the next
+    interval seconds without waiting; timestamps are the clock times at which they are returned.
+    """
+
+    #: Number of samples returned so far
+    position = 0
+
+    #: Never set (the interface of ActiveTwo)
+    error = None
+
+    def __init__(self, signal, sfreq, interval, channels=None, dtype=np.float64, microvolts=False):
+        """
+        Prepare the recording
+        :param signal: Signal in the matrix form: samples x channels (BioSemi units unless microvolts is False
+                       and the recording is already in microvolts)
+        :param sfreq: Sampling rate
+        :param interval: How many seconds of the recording every drain returns
+        :param channels: Indices of the channels returned, in this order (default: all)
+        :param dtype: Type of the returned signal
+        :param microvolts: Return the signal scaled to microvolts (floating point dtype only)
+        """
+        self.dtype = np.dtype(dtype)
+        if microvolts and self.dtype.kind != 'f':
+            raise ValueError('Signal in microvolts needs a floating point dtype, not %s' % self.dtype)
+        self.sfreq = sfreq
+        self.interval = interval
+        self.channels = list(range(signal.shape[1])) if channels is None else list(channels)
+        self.signal = signal[:, self.channels].astype(self.dtype)
+        if microvolts:
+            self.signal *= MICROVOLTS_PER_UNIT
+        self._drains = 0
+
+    def samples_to_read(self, duration):
+        """
+        Number of samples returned by read
+        :param duration: How long to read in seconds
+        :return: Number of samples
+        """
+        return int(np.ceil(duration * self.sfreq))
+
+    def read(self, duration, out=None):
+        """
+        Read the next part of the recording
+        :param duration: How long to read in seconds
+        :param out: Optional array (samples_to_read(duration) x channels) to fill instead of a new one
+        :return: Signal in the matrix form: samples x channels
+        """
+        n = self.samples_to_read(duration)
+        if self.position + n > len(self.signal):
+            raise EOFError('End of the recording')
+        if out is None:
+            out = np.empty((n, len(self.channels)), dtype=self.dtype)
+        out[:] = self.signal[self.position:self.position + n]
+        self.position += n
+        return out
+
+    def start(self, seconds=10):
+        """
+        Nothing to start: the recording is in memory (the interface of ActiveTwo)
+        """
+
+    def stop(self):
+        """
+        Nothing to stop (the interface of ActiveTwo)
+        """
+
+    def latest(self, n_samples):
+        """
+        Get the samples returned most recently
+        :param n_samples: How many samples to get (fewer are returned if not available yet)
+        :return: Signal in the matrix form: samples x channels + timestamps of the samples
+        """
+        samples = self.signal[max(0, self.position - n_samples):self.position]
+        return samples.copy(), np.repeat(clock(), len(samples))
+
+    def drain(self):
+        """
+        Get the samples recorded during the next interval seconds
+        :return: Signal in the matrix form: samples x channels + timestamps of the samples
+        """
+        if self.position >= len(self.signal):
+            raise EOFError('End of the recording')
+        self._drains += 1
+        # rounded from the start of the recording, so that a fractional number of samples
+        # per interval does not accumulate an error
+        end = min(len(self.signal), int(round(self._drains * self.interval * self.sfreq)))
+        samples = self.signal[self.position:end]
+        self.position = end
+        return samples, np.repeat(clock(), len(samples))
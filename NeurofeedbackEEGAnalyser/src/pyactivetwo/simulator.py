@@ -0,0 +1,181 @@
+"""
+
+Python BioSemi ActiveTwo: ActiView TCP server simulator
+
+Stands in for ActiView when there is no amplifier: serves recorded or synthetic EEG
+in the ActiView TCP packet layout, so that ActiveTwo and EEGAnalyser can be run and
+benchmarked on any machine. Run from the NeurofeedbackEEGAnalyser/src directory:
+
+    python -m pyactivetwo.simulator --port 8888 --sfreq 256 --channels 40 --tcpsamples 2
+
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import os
+import re
+import socket
+import threading
+import time
+
+import numpy as np
+
+from pyactivetwo.pyactivetwo import MICROVOLTS_PER_UNIT
+
+
+def encode(signal):
+    """
+    Encode signal values the way ActiView sends them (inverse of pyactivetwo.decode)
+    :param signal: Signal in the matrix form: samples x channels, integer values
+    :return: Bytes, 3 per value, little-endian (values are wrapped to 24 bits)
+    """
+    words = np.ascontiguousarray(signal, dtype='<i4').view(np.uint8)
+    return words.reshape(signal.shape + (4,))[:, :, :3].tostring()
+
+
+def load_raw_eeg(directory):
+    """
+    Load the raw_eeg_N text dumps (one second of signal each) in the order of their numbers
+    :param directory: Directory with raw_eeg_N files
+    :return: Signal in the matrix form: samples x channels (int32)
+    """
+    files = glob.glob(os.path.join(directory, 'raw_eeg_*'))
+    files.sort(key=lambda name: int(re.search(r'(\d+)$', name).group(1)))
+    if not files:
+        raise IOError('No raw_eeg_* files in %s' % directory)
+    return np.concatenate([np.loadtxt(name) for name in files]).round().astype(np.int32)
+
+
+def synthetic(sfreq, nchannels, seconds=60, alpha=10.0, modulation=0.1, seed=0):
+    """
+    Generate EEG-like signal: noise plus an alpha rhythm whose amplitude slowly rises and falls
+    :param sfreq: Sampling rate
+    :param nchannels: Number of channels
+    :param seconds: Length of the signal
+    :param alpha: Frequency of the alpha rhythm (Hz)
+    :param modulation: How often the alpha amplitude rises and falls (Hz)
+    :param seed: Seed of the noise
+    :return: Signal in the matrix form: samples x channels (int32, BioSemi units)
+    """
+    random = np.random.RandomState(seed)
+    t = np.arange(int(seconds * sfreq)) / float(sfreq)
+    envelope = 10.0 * (1 + np.sin(2 * np.pi * modulation * t))  # 0-20 uV
+    alpha_wave = envelope * np.sin(2 * np.pi * alpha * t)
+    # channels differ in alpha strength, so that e.g. F3/F4 asymmetry is visible
+    gains = np.linspace(0.5, 1.5, nchannels)
+    microvolts = alpha_wave[:, np.newaxis] * gains + random.normal(0, 5.0, (len(t), nchannels))
+    return (microvolts / MICROVOLTS_PER_UNIT).round().astype(np.int32)
+
+
+class ActiViewSimulator():
+    """
+    TCP server sending a signal in ActiView packets to every client that connects, in a loop
+    """
+
+    #: Number of packets sent to all clients
+    packets_sent = 0
+
+    def __init__(self, signal, sfreq=512, tcpsamples=4, host='127.0.0.1', port=778, speed=1.0):
+        """
+        Prepare the packets and open the listening socket
+        :param signal: Signal in the matrix form: samples x channels, integer BioSemi units
+        :param sfreq: Sampling rate the signal is sent with
+        :param tcpsamples: Number of samples in one packet
+        :param host: Address to listen on
+        :param port: Port to listen on (0 chooses a free one, see port attribute)
+        :param speed: Multiple of real time to send with (0 sends as fast as possible)
+        """
+        self.sfreq = sfreq
+        self.tcpsamples = tcpsamples
+        self.speed = speed
+        self.nchannels = signal.shape[1]
+
+        # whole packets only, so that the loop over the signal keeps packet boundaries
+        npackets = len(signal) // tcpsamples
+        if npackets == 0:
+            raise ValueError('Signal is shorter than one packet')
+        self.data = encode(signal[:npackets * tcpsamples])
+        self.packet_size = self.nchannels * tcpsamples * 3
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(5)
+        self.host, self.port = self.server.getsockname()
+
+    def _stream(self, client):
+        """
+        Send packets to one client, paced by the sampling rate, until it disconnects
+        """
+        packets_per_second = self.speed * self.sfreq / float(self.tcpsamples)
+        # with no pacing, send many packets per call
+        burst = self.packet_size * (1 if self.speed else 64)
+        position = 0
+        sent = 0
+        start = time.time()
+        try:
+            while True:
+                if self.speed:
+                    delay = start + sent / packets_per_second - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                chunk = self.data[position:position + burst]
+                client.sendall(chunk)
+                position = (position + len(chunk)) % len(self.data)
+                sent += len(chunk) // self.packet_size
+                self.packets_sent += len(chunk) // self.packet_size
+        except socket.error:
+            pass
+        finally:
+            client.close()
+
+    def serve_forever(self):
+        """
+        Accept clients and serve each of them in its own thread
+        """
+        while True:
+            client, _ = self.server.accept()
+            thread = threading.Thread(target=self._stream, args=(client,))
+            thread.daemon = True
+            thread.start()
+
+    def start(self):
+        """
+        Serve clients in a background thread
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the ActiView TCP server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--sfreq', type=int, default=256)
+    parser.add_argument('--channels', type=int, default=40)
+    parser.add_argument('--tcpsamples', type=int, default=2)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='multiple of real time, 0 = as fast as possible')
+    parser.add_argument('--raw-eeg', metavar='DIR',
+                        help='replay raw_eeg_N files from DIR instead of a synthetic signal')
+    args = parser.parse_args()
+
+    if args.raw_eeg:
+        signal = load_raw_eeg(args.raw_eeg)
+        # repeat or drop columns to get the requested number of channels
+        signal = signal[:, np.arange(args.channels) % signal.shape[1]]
+    else:
+        signal = synthetic(args.sfreq, args.channels)
+
+    simulator = ActiViewSimulator(signal, sfreq=args.sfreq, tcpsamples=args.tcpsamples,
+                                  host=args.host, port=args.port, speed=args.speed)
+    print 'Serving %d channels @ %d Hz (%d samples per packet) on %s:%d' % (
+        args.channels, args.sfreq, args.tcpsamples, simulator.host, simulator.port)
+    simulator.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1036,6 +1036,54 @@ def lfilter_zi(b, a, n=1):
     return zi
 
 
+def sosfilt_zi(sos, n=1):
+    """Compute an initial state ``zi`` for :func:`scipy.signal.sosfilt`.
+
+    This method mainly delegates the call to
+    :func:`scipy.signal.sosfilt_zi` and repeats the result ``zi`` ``n``
+    times along a last axis. This fits multi channel EEG with the
+    channels on the last axis, filtered along ``axis=0``. Cascaded
+    second-order sections are numerically more robust than the ``b``,
+    ``a`` coefficients of :func:`lfilter` for high orders and narrow
+    bands.
+
+    Parameters
+    ----------
+    sos : 2d array
+        the second-order sections, shape ``(n_sections, 6)``
+    n : int, optional
+        The number of channels. The output has the shape
+        ``(n_sections, 2, n)``, also for ``n == 1``.
+
+    Returns
+    -------
+    zi : 3d array
+        The initial state of the filter: the steady state for a unit
+        step, so scale it by the first sample to start without a
+        transient.
+
+    See Also
+    --------
+    :func:`lfilter_zi`, :func:`scipy.signal.sosfilt_zi`,
+    :func:`scipy.signal.sosfilt`
+
+    Examples
+    --------
+
+    >>> sos = signal.butter(4, [8 / fn, 12 / fn], btype='band', output='sos')
+    >>> zi = None
+    >>> while 1:
+    ...     data, markers = amp.get_data()
+    ...     if zi is None:
+    ...         zi = proc.sosfilt_zi(sos, len(CHANNELS)) * data[0]
+    ...     filtered, zi = signal.sosfilt(sos, data, axis=0, zi=zi)
+    ...     ...
+
+    """
+    zi = signal.sosfilt_zi(sos)
+    return np.repeat(zi[:, :, np.newaxis], n, axis=2)
+
+
 def calculate_whitening_matrix(dat):
     """Calculate whitening matrix from continuous data.
 